@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+
+class Busy(Exception):
+    pass
+
+
+# Bounds concurrent work globally and per caller. Callers over either limit wait in a bounded queue and
+# are turned away once it is full or the wait times out. `shared` callers (unauthenticated traffic, which
+# is everyone without a token) stand for many clients at once, so only the global limit applies to them
+class AdmissionController:
+    def __init__(self, max_concurrency: int, per_caller: int, max_queue: int, queue_timeout: float, shared: tuple[str, ...] = ()):
+        self.max_concurrency = max_concurrency
+        self.per_caller = per_caller
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.shared = shared
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._callers: dict[str, int] = defaultdict(int)  # songs held or waited for, per caller
+        self._caller_slots: dict[str, asyncio.Semaphore] = {}
+
+    async def acquire(self, caller: str) -> None:
+        own = self._caller_slots.get(caller)
+        if self.waiting >= self.max_queue and (own is not None and own.locked()):
+            self.rejected += 1
+            raise Busy(f"caller already has {self.per_caller} songs in progress and the queue is full")
+        if self.waiting >= self.max_queue and self._slots.locked():
+            self.rejected += 1
+            raise Busy("server is at capacity, try again shortly")
+
+        self._callers[caller] += 1
+        if caller not in self.shared:
+            own = self._caller_slots.setdefault(caller, asyncio.Semaphore(self.per_caller))
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                if own is not None:
+                    await own.acquire()
+                try:
+                    await self._slots.acquire()
+                except BaseException:
+                    if own is not None:
+                        own.release()
+                    raise
+        except TimeoutError:
+            self.timed_out += 1
+            self._forget(caller)
+            raise Busy(f"waited {self.queue_timeout:g}s for a free slot")
+        except BaseException:
+            self._forget(caller)
+            raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.admitted += 1
+        self.active += 1
+
+    def release(self, caller: str) -> None:
+        self.active -= 1
+        self._slots.release()
+        if caller in self._caller_slots:
+            self._caller_slots[caller].release()
+        self._forget(caller)
+
+    @asynccontextmanager
+    async def slot(self, caller: str):
+        await self.acquire(caller)
+        try:
+            yield
+        finally:
+            self.release(caller)
+
+    def _forget(self, caller: str) -> None:
+        self._callers[caller] -= 1
+        if not self._callers[caller]:
+            del self._callers[caller]
+            self._caller_slots.pop(caller, None)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "callers": len(self._callers),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 4) if self.admitted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+        }
@@ -0,0 +1,43 @@
+def strip_id3(data: bytes | memoryview) -> bytes | memoryview:
+    # Slicing a memoryview drops the tags without copying the frames in between
+    # ID3v2 header: "ID3", version (2), flags (1), syncsafe size (4)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    # ID3v1 trailer
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def join_mp3(parts: list[bytes]) -> bytes:
+    # MP3 is a plain sequence of frames, so parts concatenate once their tags are dropped
+    if len(parts) == 1:
+        return parts[0]
+    return b"".join(strip_id3(memoryview(part)) for part in parts)
+
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "pcm": "audio/pcm",
+    "ulaw": "audio/basic",
+    "alaw": "audio/x-alaw-basic",
+}
+
+
+def audio_extension(output_format: str) -> str:
+    # ElevenLabs formats are codec_samplerate[_bitrate], e.g. mp3_44100_128 or pcm_16000
+    return output_format.split("_", 1)[0]
+
+
+def media_type(output_format: str) -> str:
+    return MEDIA_TYPES[audio_extension(output_format)]
+
+
+def join_audio(parts: list[bytes], output_format: str) -> bytes:
+    if audio_extension(output_format) == "mp3":
+        return join_mp3(parts)
+    # Raw PCM/u-law/a-law samples simply follow each other; Ogg Opus parts become a chained stream
+    return b"".join(parts)
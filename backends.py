@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import importlib
+import math
+import sys
+from array import array
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Callable
+
+if TYPE_CHECKING:
+    from elevenlabs import VoiceSettings
+    from elevenlabs.client import AsyncElevenLabs
+
+# MPEG-1 Layer III frame header, so clients that sniff placeholder audio see "mp3"
+FRAME_HEADER = b"\xff\xfb\x90\x64"
+# Sung text runs at roughly 15 characters a second
+CHARS_PER_SECOND = 15
+# Fields of elevenlabs.VoiceSettings, all optional
+VOICE_SETTINGS_FIELDS = ("stability", "similarity_boost", "style", "use_speaker_boost", "speed")
+
+
+def bytes_per_second(output_format: str) -> float:
+    codec, rate, *bitrate = output_format.split("_")
+    if codec in ("mp3", "opus"):
+        return int(bitrate[0]) * 1000 / 8
+    if codec == "pcm":
+        return int(rate) * 2
+    return int(rate)  # 8-bit u-law / a-law
+
+
+# A text-to-speech engine. convert() returns the audio as an async stream of chunks; key_parts() is
+# everything besides the text and format that changes the audio, and goes into cache keys
+class Backend:
+    name = ""
+    remote = False  # remote backends are called through retries and the circuit breaker
+
+    @property
+    def label(self) -> str:
+        # Latency is tracked per label, so backends that serve several models tell them apart here
+        return self.name
+
+    def key_parts(self) -> tuple:
+        return (self.name,)
+
+    async def load(self) -> None:
+        # Called before each convert() or stream(); anything slow to set up happens here, once
+        pass
+
+    def convert(self, text: str, output_format: str, previous_text: str | None = None, next_text: str | None = None) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    def stream(self, text: str, output_format: str, chunk_size: int) -> AsyncIterator[bytes]:
+        return self.convert(text, output_format)
+
+
+# The SDK is imported and the client built on first use rather than at startup: its generated types
+# take longer to import than the rest of the server together. load() imports it on a worker thread,
+# so the event loop keeps serving while the first ElevenLabs song waits for it
+class ElevenLabsBackend(Backend):
+    name = "elevenlabs"
+    remote = True
+
+    def __init__(self, connect: Callable[[], "AsyncElevenLabs"], voice_id: str, model_id: str, voice_settings: dict):
+        self.connect = connect
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.settings = voice_settings
+        # What VoiceSettings(**settings).model_dump() gives, unset fields included, so cache keys need no SDK
+        self.settings_dump = {**dict.fromkeys(VOICE_SETTINGS_FIELDS), **voice_settings}
+        self._loading = asyncio.Lock()
+
+    async def load(self) -> None:
+        if "client" in self.__dict__:
+            return
+        async with self._loading:
+            if "client" not in self.__dict__:
+                await asyncio.to_thread(importlib.import_module, "elevenlabs.client")
+                self.voice_settings
+                self.client
+
+    @cached_property
+    def client(self) -> "AsyncElevenLabs":
+        return self.connect()
+
+    @cached_property
+    def voice_settings(self) -> "VoiceSettings":
+        from elevenlabs import VoiceSettings
+        return VoiceSettings(**self.settings)
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}/{self.model_id}"
+
+    def key_parts(self) -> tuple:
+        # Same parts as before backends existed, so songs already in the cache keep their keys
+        return (self.voice_id, self.model_id, self.settings_dump)
+
+    def convert(self, text, output_format, previous_text=None, next_text=None):
+        # Neighbouring lyrics let ElevenLabs carry prosody across separately synthesized chunks
+        context = {}
+        if previous_text:
+            context["previous_text"] = previous_text
+        if next_text:
+            context["next_text"] = next_text
+        return self.client.text_to_speech.convert(
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            text=text,
+            voice_settings=self.voice_settings,
+            output_format=output_format,
+            **context
+        )
+
+    def stream(self, text, output_format, chunk_size):
+        # The streaming endpoint starts sending audio before the whole song is synthesized
+        return self.client.text_to_speech.stream(
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            text=text,
+            voice_settings=self.voice_settings,
+            output_format=output_format,
+            request_options={"chunk_size": chunk_size}
+        )
+
+
+# Placeholder audio sized like the real thing, derived from the text alone: the same lyrics always give
+# the same bytes. For load tests and CI, where only sizes and timings matter
+class StubBackend(Backend):
+    name = "stub"
+
+    def __init__(self, chunk_size: int = 16 * 1024):
+        self.chunk_size = chunk_size
+
+    async def convert(self, text, output_format, previous_text=None, next_text=None):
+        total = int(bytes_per_second(output_format) * len(text) / CHARS_PER_SECOND)
+        pattern = FRAME_HEADER + hashlib.sha256(f"{output_format}\n{text}".encode("utf-8")).digest() * 16
+        audio = memoryview(pattern * (total // len(pattern) + 1))[:total]
+        for start in range(0, total, self.chunk_size):
+            yield bytes(audio[start:start + self.chunk_size])
+
+
+# Pentatonic scale, so whatever notes the words land on sound fine together
+SCALE = (0, 2, 4, 7, 9, 12, 14, 16)
+# First two formants of each vowel, in Hz
+VOWEL_FORMANTS = {"a": (800, 1200), "e": (400, 2300), "i": (300, 2700), "o": (500, 900), "u": (350, 700), "y": (300, 2200)}
+
+
+def _formant_gain(frequency: float, formants: tuple[int, int]) -> float:
+    return 0.05 + sum(1 / (1 + ((frequency - formant) / 120) ** 2) for formant in formants)
+
+
+@lru_cache(maxsize=1024)
+def _period(samples: int, rate: int, vowel: str) -> bytes:
+    # One period of a harmonic tone, its harmonics shaped by the vowel's formants; whole periods
+    # start and end on zero, so notes tiled from them join without clicks
+    fundamental = rate / samples
+    formants = VOWEL_FORMANTS[vowel]
+    harmonics = [(k, _formant_gain(k * fundamental, formants) / k) for k in range(1, int(min(rate / 2, 4000) / fundamental) + 1)]
+    wave = [sum(gain * math.sin(2 * math.pi * k * n / samples) for k, gain in harmonics) for n in range(samples)]
+    scale = 12000 / max(max(map(abs, wave)), 1e-9)
+    period = array("h", (round(value * scale) for value in wave))
+    if sys.byteorder == "big":
+        period.byteswap()  # pcm output is little-endian
+    return period.tobytes()
+
+
+def sing_word(word: str, rate: int) -> bytes:
+    # Each word holds one note picked from its spelling, for about as long as it takes to say it
+    digest = hashlib.sha256(word.lower().encode("utf-8")).digest()
+    frequency = 220 * 2 ** (SCALE[digest[0] % len(SCALE)] / 12)
+    vowel = next((c for c in word.lower() if c in VOWEL_FORMANTS), "a")
+    period = _period(round(rate / frequency), rate, vowel)
+    repeats = max(1, round(max(len(word), 2) / CHARS_PER_SECOND * frequency))
+    return period * repeats
+
+
+# Offline singer: a sine/formant tone per word, rendered on the CPU with no network. Only produces raw
+# pcm, since mp3 and opus would need an encoder this project does not ship
+class SynthBackend(Backend):
+    name = "synth"
+
+    def key_parts(self) -> tuple:
+        return (self.name, 1)  # bump when the sound changes, so cached songs are not reused
+
+    async def convert(self, text, output_format, previous_text=None, next_text=None):
+        codec, rate, *_ = output_format.split("_")
+        if codec != "pcm":
+            raise ValueError(f"synth backend only renders pcm formats, not {output_format}")
+        rate = int(rate)
+        word_gap = bytes(2 * rate // 20)
+        line_gap = bytes(2 * rate // 4)
+        for line in text.splitlines():
+            words = line.split()
+            if words:
+                yield word_gap.join(sing_word(word, rate) for word in words) + line_gap
+            else:
+                yield line_gap
+            # One line at a time, with the event loop free to run other work in between
+            await asyncio.sleep(0)
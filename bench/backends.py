@@ -0,0 +1,96 @@
+# Songs per second from each TTS backend, through the full generate_song_base64 path, and checks that the
+# local backends need no network and give the same audio for the same lyrics. The ElevenLabs row runs
+# against the fake upstream with its usual synthesis latency.
+#   uv run python -m bench.backends --songs 40 --concurrency 8
+import argparse
+import asyncio
+import math
+import os
+import struct
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+VERSE = "Hold on, hold on, the morning's coming soon\nSing it to the rooftops, sing it to the moon"
+
+
+def rms(pcm: bytes) -> float:
+    samples = struct.unpack(f"<{len(pcm) // 2}h", pcm[:len(pcm) // 2 * 2])
+    return math.sqrt(sum(s * s for s in samples) / max(len(samples), 1))
+
+
+async def run(songs: int, concurrency: int, latency: float) -> bool:
+    start_fake_upstream(latency=latency)
+    # Measure the backends rather than admission policy
+    os.environ["MAX_SYNTHESES_PER_CALLER"] = str(concurrency)
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = str(concurrency)
+
+    from fastmcp import Client
+    import main
+
+    results = {}
+    async with Client(main.mcp) as client:
+        print(f"{songs} distinct songs at concurrency {concurrency}, pcm_22050, output=resource")
+        print(f"{'backend':12}{'songs/s':>10}{'MB/s':>9}{'errors':>8}")
+        for name in ("elevenlabs", "stub", "synth"):
+            pending = iter(range(songs))
+            sizes, errors = [], 0
+
+            async def worker():
+                nonlocal errors
+                for i in pending:
+                    args = {"lyrics": f"{VERSE}\n({name} take {i})", "output_format": "pcm_22050", "output": "resource", "backend": name}
+                    result = await client.call_tool("generate_song_base64", args)
+                    if result.content[0].text.startswith("✅"):
+                        sizes.append(result.content[1].size)
+                    else:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            wall = time.perf_counter() - start
+            results[name] = (songs / wall, errors)
+            print(f"{name:12}{songs / wall:>10.1f}{sum(sizes) / wall / 1e6:>9.1f}{errors:>8}")
+
+    # Local backends must not touch the network and must repeat themselves exactly
+    requests_before = main.http_pool.requests
+    stub, synth = main.backends["stub"], main.backends["synth"]
+    same_stub = await main.convert(stub, VERSE, "mp3_44100_128") == await main.convert(stub, VERSE, "mp3_44100_128")
+    sung = await main.convert(synth, VERSE, "pcm_22050")
+    same_synth = sung == await main.convert(synth, VERSE, "pcm_22050")
+    offline = main.http_pool.requests == requests_before
+    seconds = len(sung) / 2 / 22050
+    loudness = rms(bytes(sung))
+    print(f"stub deterministic: {same_stub}, synth deterministic: {same_synth}, no upstream requests: {offline}")
+    print(f"synth: {seconds:.1f}s of audio for {len(VERSE)} characters, rms {loudness:.0f}")
+
+    # With a fallback configured, requests that did not pick a backend leave ElevenLabs while its circuit is open
+    main.TTS_FALLBACK_BACKEND = "synth"
+    main.upstream.breaker.state, main.upstream.breaker.opened_at = "open", time.monotonic()
+    routed = main.select_backend(None).name
+    pinned = main.select_backend("elevenlabs").name
+    print(f"circuit open: default requests go to {routed}, explicit elevenlabs stays on {pinned}")
+
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+
+    passed = (
+        same_stub and same_synth and offline and loudness > 100
+        and not any(errors for _, errors in results.values())
+        and results["stub"][0] > results["elevenlabs"][0] and results["synth"][0] > results["elevenlabs"][0]
+        and routed == "synth" and pinned == "elevenlabs"
+    )
+    print("✅ PASS" if passed else "❌ FAIL")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--songs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream synthesis time")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.songs, args.concurrency, args.latency)) else 1)
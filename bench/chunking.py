@@ -0,0 +1,58 @@
+# Wall time for a multi-verse song: sent whole, split into verses synthesized in parallel,
+# and regenerated after editing one line (only that verse misses the cache).
+#   uv run python -m bench.chunking --verses 8
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+VERSE = "\n".join([
+    "We were running through the city lights tonight",
+    "Every window burning gold and every street alive",
+    "Hold on, hold on, the morning's coming soon",
+    "Sing it to the rooftops, sing it to the moon",
+])
+
+
+async def run(verses: int, per_char: float) -> bool:
+    start_fake_upstream(latency=0.2, latency_per_char=per_char)
+
+    from fastmcp import Client
+    import main
+
+    def song(label: str, edited_verse: int | None = None) -> str:
+        lines = [f"{VERSE}\n(verse {i + 1}, {label})" for i in range(verses)]
+        if edited_verse is not None:
+            lines[edited_verse] = lines[edited_verse].replace("tonight", "all night")
+        return "\n\n".join(lines)
+
+    timings = {}
+    async with Client(main.mcp) as client:
+        # "edited" re-sends the chunked song with one line changed: only that verse should be synthesized
+        runs = [("whole", 0, song("whole")), ("chunked", main.CHUNK_MAX_CHARS, song("chunked")),
+                ("edited", main.CHUNK_MAX_CHARS, song("chunked", edited_verse=2))]
+        for label, max_chars, lyrics in runs:
+            main.CHUNK_MAX_CHARS = max_chars
+            start = time.perf_counter()
+            result = await client.call_tool("generate_song_base64", {"lyrics": lyrics})
+            timings[label] = time.perf_counter() - start
+            assert result.content[0].text.startswith("✅"), result.content[0].text[:200]
+    await main.audio_cache.close()
+
+    print(f"🎼 {verses} verses, {len(VERSE) * verses} chars, chunk concurrency {main.CHUNK_CONCURRENCY}")
+    print(f"   verses synthesized {main.verse_stats['synthesized']}, reused {main.verse_stats['reused']}")
+    for label, seconds in timings.items():
+        print(f"   {label:8} {seconds:.2f}s")
+    return timings["edited"] < timings["chunked"] < timings["whole"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verses", type=int, default=8)
+    parser.add_argument("--latency-per-char", type=float, default=0.002)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.verses, args.latency_per_char))
+    print("✅ PASS" if ok else "❌ FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,52 @@
+# Identical songs requested at once, more of them than MAX_CONCURRENT_SYNTHESES admits: however they
+# queue, ElevenLabs should be asked (and bill) for the song exactly once, and every request should get it.
+#   uv run python -m bench.coalescing --requests 24 --max-concurrency 8
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+LYRICS = "Hold on, hold on, the morning's coming soon"
+
+
+async def run(requests: int, max_concurrency: int, latency: float) -> bool:
+    upstream = start_fake_upstream(latency=latency)
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = str(max_concurrency)
+    os.environ["CHUNK_MAX_CHARS"] = "0"
+
+    from fastmcp import Client
+    import main
+
+    async with Client(main.mcp) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            client.call_tool("generate_song_base64", {"lyrics": LYRICS, "output": "resource"}) for _ in range(requests)
+        ))
+        wall = time.perf_counter() - start
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+
+    generated = sum(result.content[0].text.startswith("✅") for result in results)
+    flights = main.inflight.stats()
+    billed = len(main.prepare_lyrics(LYRICS))
+    print(f"🎵 {generated}/{requests} identical songs in {wall:.2f}s with {max_concurrency} admission slots")
+    print(f"   upstream calls {flights['upstream_calls']}, coalesced {flights['coalesced']}, "
+          f"characters billed {upstream.state.characters} (lyrics are {billed})")
+
+    passed = generated == requests and flights["upstream_calls"] == 1 and upstream.state.characters == billed
+    print("✅ PASS" if passed else "❌ FAIL: identical requests reached ElevenLabs more than once")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="MAX_CONCURRENT_SYNTHESES; keep it below --requests")
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.requests, args.max_concurrency, args.latency)) else 1)
@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from backends import FRAME_HEADER, bytes_per_second
+
+
+def create_app(
+    latency: float = 0.5,
+    chunk_size: int = 4096,
+    chunks: int = 16,
+    chunk_delay: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    retry_after: float | None = None,
+    seed: int | None = None,
+    latency_per_char: float = 0.0,
+    bandwidth: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 0.0,
+    max_concurrency: int = 0,
+    chars_per_minute: int = 0,
+    character_limit: int = 100_000,
+) -> Starlette:
+    rng = random.Random(seed)
+
+    def account_headers(state) -> dict:
+        # What ElevenLabs reports on every text-to-speech response
+        if not max_concurrency:
+            return {}
+        return {"current-concurrent-requests": str(state.in_flight), "maximum-concurrent-requests": str(max_concurrency)}
+
+    def throttle(state, status: str, retry_after: float | None = None) -> Response:
+        state.throttled += 1
+        headers = account_headers(state)
+        if retry_after is not None:
+            headers["retry-after"] = f"{retry_after:.3f}"
+        return JSONResponse({"detail": {"status": status, "message": "account limit reached"}}, status_code=429, headers=headers)
+
+    def within_limits(state, chars: int) -> Response | None:
+        # Account limits as ElevenLabs enforces them: requests in flight, plus (optionally) characters
+        # per minute from a bucket holding one minute's worth
+        if max_concurrency and state.in_flight >= max_concurrency:
+            return throttle(state, "too_many_concurrent_requests")
+        if chars_per_minute:
+            now = time.monotonic()
+            state.tokens = min(state.tokens + (now - state.refilled_at) * chars_per_minute / 60, chars_per_minute)
+            state.refilled_at = now
+            if state.tokens < min(chars, chars_per_minute):
+                return throttle(state, "rate_limit_exceeded", (min(chars, chars_per_minute) - state.tokens) * 60 / chars_per_minute)
+            state.tokens -= chars
+        return None
+
+    async def convert(request: Request):
+        # Distinct client ports tell benchmarks how many connections the caller opened
+        state = request.app.state
+        state.peers.add(request.client)
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # Callers cancel requests they no longer need, e.g. the losing half of a hedge
+            return Response(status_code=499)
+        chars = len(body.get("text", ""))
+        if (throttled := within_limits(state, chars)) is not None:
+            return throttled
+        # Synthesis time grows with the text, like the real service
+        delay = latency + latency_per_char * chars
+        # slow_rate of the calls stall for slow_latency more, the long tail hedging is meant to cut
+        if rng.random() < slow_rate:
+            delay += slow_latency
+        # The injected failure lives on app.state so a running benchmark can change it; fail_first fails
+        # that many attempts at each text before letting it through
+        text = body.get("text", "")
+        if rng.random() < state.error_rate or state.failed[text] < state.fail_first:
+            state.failed[text] += 1
+            await asyncio.sleep(delay)
+            state.attempts.append((time.monotonic(), text, state.error_status))
+            headers = {}
+            if state.retry_after is not None:
+                # ElevenLabs may send either; retry-after-ms is in milliseconds
+                if state.retry_after_header == "retry-after-ms":
+                    headers["retry-after-ms"] = f"{state.retry_after * 1000:g}"
+                else:
+                    headers["retry-after"] = f"{state.retry_after:g}"
+            return JSONResponse({"detail": "injected failure"}, status_code=state.error_status, headers=headers)
+        state.attempts.append((time.monotonic(), text, 200))
+        state.characters += chars
+
+        output_format = request.query_params.get("output_format")
+        if output_format:
+            # Size the audio like the real encoder would: sung text runs at roughly 15 chars/second
+            total = int(bytes_per_second(output_format) * len(body.get("text", "")) / 15)
+        else:
+            total = chunk_size * chunks
+
+        async def audio():
+            # Time-to-first-byte stands in for the upstream synthesis time
+            try:
+                await asyncio.sleep(delay)
+                for start in range(0, total, chunk_size):
+                    size = min(chunk_size, total - start)
+                    yield (FRAME_HEADER + bytes(max(size - len(FRAME_HEADER), 0)))[:size]
+                    # bandwidth (bytes/second) throttles delivery like a slow upstream link would
+                    if chunk_delay or bandwidth:
+                        await asyncio.sleep(chunk_delay + (size / bandwidth if bandwidth else 0))
+            finally:
+                state.in_flight -= 1
+
+        # The request counts against the account until its audio has been sent
+        state.in_flight += 1
+        headers = {**account_headers(state), "character-cost": str(chars)}
+        return StreamingResponse(audio(), media_type="audio/mpeg", headers=headers)
+
+    async def subscription(request: Request):
+        return JSONResponse({
+            "tier": "creator",
+            "character_count": request.app.state.characters,
+            "character_limit": character_limit,
+            "can_extend_character_limit": False,
+            "allowed_to_extend_character_limit": False,
+            "next_character_count_reset_unix": int(time.time()) + 30 * 24 * 3600,
+            "voice_slots_used": 0,
+            "professional_voice_slots_used": 0,
+            "voice_limit": 30,
+            "voice_add_edit_counter": 0,
+            "professional_voice_limit": 1,
+            "can_extend_voice_limit": False,
+            "can_use_instant_voice_cloning": True,
+            "can_use_professional_voice_cloning": True,
+            "status": "active",
+            "has_open_invoices": False,
+        })
+
+    app = Starlette(routes=[
+        Route("/v1/text-to-speech/{voice_id}", convert, methods=["POST"]),
+        Route("/v1/text-to-speech/{voice_id}/stream", convert, methods=["POST"]),
+        Route("/v1/user/subscription", subscription, methods=["GET"]),
+    ])
+    app.state.error_rate = error_rate
+    app.state.error_status = error_status
+    app.state.retry_after = retry_after
+    app.state.retry_after_header = "retry-after"
+    app.state.fail_first = 0
+    app.state.failed = Counter()
+    app.state.attempts = []  # (monotonic time, text, status) of every synthesis request that got past the limits
+    app.state.peers = set()
+    app.state.in_flight = 0
+    app.state.throttled = 0
+    app.state.characters = 0
+    app.state.tokens = float(chars_per_minute)
+    app.state.refilled_at = time.monotonic()
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app: Starlette, port: int, **config) -> uvicorn.Server:
+    # Runs on its own loop so a blocked server loop cannot stall the fake upstream
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", **config))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        threading.Event().wait(0.01)
+    return server
+
+
+async def _relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+    # Each chunk arrives `delay` seconds after it was sent; call_later keeps them in order
+    loop = asyncio.get_running_loop()
+    try:
+        while data := await reader.read(65536):
+            loop.call_later(delay, writer.write, data)
+    finally:
+        loop.call_later(delay, writer.close)
+
+
+def start_latency_proxy(target_port: int, rtt: float) -> int:
+    # Loopback has no round-trip time, which hides what new connections cost against the real API.
+    # This TCP proxy adds rtt/2 each way, plus one rtt for the TCP handshake.
+    async def handle(client_reader, client_writer):
+        await asyncio.sleep(rtt)
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        await asyncio.gather(
+            _relay(client_reader, upstream_writer, rtt / 2),
+            _relay(upstream_reader, client_writer, rtt / 2),
+        )
+
+    port = free_port()
+    started = threading.Event()
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port)
+        started.set()
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return port
+
+
+def start_fake_upstream(**options) -> Starlette:
+    # Serve a fake upstream and point the server config at it; call before importing main
+    app = create_app(**options)
+    port = free_port()
+    serve_in_thread(app, port)
+    os.environ["ELEVENLABS_API_KEY"] = "fake"
+    os.environ["ELEVENLABS_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("CACHE_PATH", ":memory:")
+    os.environ.setdefault("JOBS_PATH", ":memory:")
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake ElevenLabs text-to-speech server")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--chunks", type=int, default=16)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--latency-per-char", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="account limit on requests in flight, 0 = none")
+    parser.add_argument("--chars-per-minute", type=int, default=0, help="account limit on characters, 0 = none")
+    args = parser.parse_args()
+    app = create_app(
+        args.latency, args.chunk_size, args.chunks, args.chunk_delay,
+        args.error_rate, args.error_status, args.retry_after,
+        latency_per_char=args.latency_per_char, bandwidth=args.bandwidth,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+        max_concurrency=args.max_concurrency, chars_per_minute=args.chars_per_minute,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,50 @@
+# Bytes on the wire and end-to-end latency of generate_song_base64 per output format.
+#   uv run python -m bench.formats --bandwidth 500000
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+FORMATS = ["mp3_44100_128", "mp3_44100_64", "mp3_22050_32", "opus_48000_64", "opus_48000_32", "pcm_16000", "pcm_44100"]
+
+LYRICS = "\n".join([
+    "We were running through the city lights tonight",
+    "Every window burning gold and every street alive",
+    "Hold on, hold on, the morning's coming soon",
+    "Sing it to the rooftops, sing it to the moon",
+])
+
+
+async def run(rounds: int, bandwidth: float) -> None:
+    start_fake_upstream(latency=0.3, chunk_size=16 * 1024, bandwidth=bandwidth)
+
+    from fastmcp import Client
+    import main
+
+    print(f"{'format':16}{'audio bytes':>14}{'data_uri bytes':>16}{'resource bytes':>16}{'latency':>10}")
+    async with Client(main.mcp) as client:
+        for output_format in FORMATS:
+            latencies = []
+            for i in range(rounds):
+                # Distinct lyrics per round so every call pays for synthesis
+                args = {"lyrics": f"{LYRICS}\n(take {i})", "output_format": output_format}
+                start = time.perf_counter()
+                inline = await client.call_tool("generate_song_base64", args)
+                latencies.append(time.perf_counter() - start)
+            linked = await client.call_tool("generate_song_base64", {**args, "output": "resource"})
+            audio_bytes = linked.content[1].size
+            inline_bytes = sum(len(block.text.encode()) for block in inline.content)
+            linked_bytes = sum(len(block.model_dump_json().encode()) for block in linked.content)
+            print(f"{output_format:16}{audio_bytes:>14}{inline_bytes:>16}{linked_bytes:>16}"
+                  f"{statistics.median(latencies) * 1000:>8.0f}ms")
+    await main.audio_cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bandwidth", type=float, default=500_000, help="upstream link speed in bytes/second")
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds, args.bandwidth))
@@ -0,0 +1,84 @@
+# Tail latency against an upstream where a few calls stall, without hedging and with it. The fake
+# upstream answers most calls in --latency but --slow-rate of them take --slow-latency longer; hedged
+# calls send a second request once the first is slower than the recent p95, within HEDGE_BUDGET.
+#   uv run python -m bench.hedging --calls 400 --slow-rate 0.03 --budget 0.1
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+from bench.measure import percentiles
+
+LYRICS = "Hold on, hold on, the morning's coming soon"
+
+
+async def run(calls: int, concurrency: int, latency: float, slow_rate: float, slow_latency: float, budget: float) -> bool:
+    start_fake_upstream(latency=latency, slow_rate=slow_rate, slow_latency=slow_latency, seed=7)
+    # Measure hedging rather than admission policy
+    os.environ["MAX_SYNTHESES_PER_CALLER"] = str(concurrency)
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = str(concurrency)
+
+    from fastmcp import Client
+    import main
+
+    results = {}
+    async with Client(main.mcp) as client:
+        print(f"{calls} calls at concurrency {concurrency}; upstream {latency * 1000:.0f}ms, "
+              f"{slow_rate:.0%} of calls +{slow_latency * 1000:.0f}ms")
+        print(f"{'mode':10}{'calls/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'upstream reqs':>15}{'hedged':>8}{'won':>6}")
+        # The warm-up pass fills the latency history and gets first-call costs out of the compared runs
+        for mode, mode_budget in (("warm-up", 0.0), ("unhedged", 0.0), ("hedged", budget)):
+            main.router.budget = mode_budget
+            pending = iter(range(calls))
+            latencies = []
+
+            async def worker():
+                for i in pending:
+                    args = {"lyrics": f"{LYRICS} ({mode} take {i})", "output_format": "mp3_22050_32", "output": "resource"}
+                    start = time.perf_counter()
+                    result = await client.call_tool("generate_song_base64", args)
+                    latencies.append(time.perf_counter() - start)
+                    assert result.content[0].text.startswith("✅"), result.content[0].text
+
+            hedged_before = main.router.totals()
+            requests_before = main.http_pool.requests
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            wall = time.perf_counter() - start
+            totals = main.router.totals()
+            hedged = totals["hedged"] - hedged_before["hedged"]
+            won = totals["hedge_wins"] - hedged_before["hedge_wins"]
+            requests = main.http_pool.requests - requests_before
+            stats = {key: value * 1000 for key, value in percentiles(latencies).items()}
+            results[mode] = {**stats, "requests": requests, "hedged": hedged}
+            print(f"{mode:10}{calls / wall:>9.1f}{stats['p50']:>7.0f}ms{stats['p95']:>7.0f}ms{stats['p99']:>7.0f}ms{stats['max']:>7.0f}ms"
+                  f"{requests:>15}{hedged:>8}{won:>6}")
+    print(json.dumps(main.router.stats()))
+
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+
+    # Hedging should cut the tail while staying inside its budget of extra upstream requests. Calls no
+    # longer stuck behind a stall also keep every worker busy, which can cost some median latency when
+    # the benchmark client shares one CPU with the server
+    extra = results["hedged"]["requests"] - calls
+    passed = results["hedged"]["p99"] < results["unhedged"]["p99"] and extra <= budget * calls + main.router.burst
+    print("✅ PASS" if passed else "❌ FAIL: hedging did not cut the tail within its budget")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="usual upstream time to first chunk")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="share of upstream calls that stall")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="how much longer a stalled call takes")
+    parser.add_argument("--budget", type=float, default=0.1, help="HEDGE_BUDGET for the hedged run")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.calls, args.concurrency, args.latency, args.slow_rate, args.slow_latency, args.budget)) else 1)
@@ -0,0 +1,87 @@
+# Cold-start cost of `import main`, checked against the budget tracked in bench/import_budget.json:
+# median wall time over fresh interpreters, the packages that dominate it (from `python -X importtime`)
+# and modules that must stay deferred until first use, with what loading them later costs.
+#   uv run python -m bench.importtime --runs 5
+#   uv run python -m bench.importtime --budget 900
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "import_budget.json")
+TIMED_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+deferred = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1:]))
+start = time.perf_counter()
+main.backends["elevenlabs"].client
+main.backends["elevenlabs"].voice_settings
+print(json.dumps({"import": imported, "deferred": deferred, "first_use": time.perf_counter() - start}))
+"""
+
+
+def python(args: list[str], directory: str) -> subprocess.CompletedProcess:
+    env = {
+        **os.environ,
+        "ELEVENLABS_API_KEY": "fake",  # the ElevenLabs backend is configured, just not loaded
+        "CACHE_PATH": os.path.join(directory, "songs.db"),
+        "JOBS_PATH": os.path.join(directory, "jobs.db"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    result = subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return result
+
+
+def package_times(stderr: str) -> dict[str, float]:
+    # Self time summed per top-level package, for everything imported underneath `main`
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return totals
+
+
+def run(runs: int, budget: dict, top: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        samples = [json.loads(python(["-c", TIMED_IMPORT, *budget["deferred"]], directory).stdout.splitlines()[-1]) for _ in range(runs)]
+        breakdown = package_times(python(["-X", "importtime", "-c", "import main"], directory).stderr)
+
+    imported = statistics.median(sample["import"] for sample in samples) * 1000
+    first_use = statistics.median(sample["first_use"] for sample in samples) * 1000
+    loaded = sorted({name for sample in samples for name in sample["deferred"]})
+    print(f"import main: {imported:.0f}ms median of {runs} (budget {budget['import_ms']}ms)")
+    print(f"{'package':24}{'self time':>12}")
+    for name, seconds in sorted(breakdown.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:24}{seconds * 1000:>10.0f}ms")
+    print(f"deferred until first use: {', '.join(budget['deferred'])} ({first_use:.0f}ms when the first ElevenLabs song needs it)")
+
+    failures = []
+    if imported > budget["import_ms"]:
+        failures.append(f"import took {imported:.0f}ms, over the {budget['import_ms']}ms budget")
+    if loaded:
+        failures.append(f"imported at startup instead of on first use: {', '.join(loaded)}")
+    print("✅ PASS" if not failures else f"❌ FAIL: {'; '.join(failures)}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--budget", type=int, help=f"import budget in ms, instead of the one in {os.path.basename(BUDGET_PATH)}")
+    parser.add_argument("--top", type=int, default=10, help="packages to list")
+    args = parser.parse_args()
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    if args.budget is not None:
+        budget["import_ms"] = args.budget
+    sys.exit(0 if run(args.runs, budget, args.top) else 1)
@@ -0,0 +1,70 @@
+# Load test: `health` latency must stay flat while songs are in flight. Passes when the p99 of health
+# calls made while songs are in flight stays under 5x the idle p99 (or 50ms, whichever is larger), with
+# at least --probes calls on each side so the p99 is not just the slowest call.
+#   uv run python -m bench.load_health --songs 50 --probes 1000
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+from bench.measure import percentiles
+
+
+async def probe_health(client, count: int, until: asyncio.Future | None = None) -> list[float]:
+    # At least `count` probes, and then on until `until` is done, so every moment songs are in flight is sampled
+    samples = []
+    while len(samples) < count or (until is not None and not until.done()):
+        start = time.perf_counter()
+        await client.call_tool("health")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(songs: int, probes: int, latency: float) -> bool:
+    start_fake_upstream(latency=latency)
+    # Every song in flight at once: measure the event loop, not admission policy
+    os.environ["MAX_SYNTHESES_PER_CALLER"] = str(songs)
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = str(songs)
+
+    from fastmcp import Client
+    import main
+
+    async with Client(main.mcp) as client:
+        idle = await probe_health(client, probes)
+
+        lyrics = [f"song number {i} with enough words to sing" for i in range(songs)]
+        start = time.perf_counter()
+        in_flight = asyncio.gather(*(client.call_tool("generate_song_base64", {"lyrics": l}) for l in lyrics))
+        await asyncio.sleep(0.05)
+        loaded = await probe_health(client, probes, in_flight)
+        results = await in_flight
+        songs_wall = time.perf_counter() - start
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+    generated = sum(result.content[0].text.startswith("✅") for result in results)
+
+    print(f"🎵 {generated}/{songs} songs in {songs_wall:.2f}s (upstream latency {latency:.2f}s each)")
+    for label, samples in (("idle", idle), (f"with {songs} songs in flight", loaded)):
+        stats = percentiles(samples)
+        print(f"🩺 health {label}: p50 {stats['p50'] * 1000:.2f} ms  p95 {stats['p95'] * 1000:.2f} ms  "
+              f"p99 {stats['p99'] * 1000:.2f} ms  max {stats['max'] * 1000:.2f} ms  ({len(samples)} probes)")
+
+    # Songs must overlap (not run back to back) and health must not wait behind them
+    overlapped = songs_wall < latency * songs / 2
+    flat = percentiles(loaded)["p99"] < max(percentiles(idle)["p99"] * 5, 0.05)
+    return generated == songs and overlapped and flat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--songs", type=int, default=50)
+    parser.add_argument("--probes", type=int, default=1000, help="minimum health calls per phase")
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.songs, args.probes, args.latency))
+    print("✅ PASS" if ok else "❌ FAIL")
+    sys.exit(0 if ok else 1)
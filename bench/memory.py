@@ -0,0 +1,130 @@
+# Peak Python heap allocated per song at each stage of the audio pipeline, as a multiple of the audio
+# size, for the current buffer handling against the previous list/join/concatenate versions (kept
+# below). A stage's own output counts too, so 1.0x is the floor for anything that returns the song.
+#   uv run python -m bench.memory --chars 1000
+import argparse
+import asyncio
+import base64
+import sys
+import tracemalloc
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+VERSE = "Hold on, hold on, the morning's coming soon\nSing it to the rooftops, sing it to the moon"
+ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x10" + bytes(16)
+
+
+async def legacy_drain(main, text: str, output_format: str) -> bytes:
+    audio = main.backends["elevenlabs"].client.text_to_speech.convert(voice_id=main.VOICE_ID, model_id=main.MODEL_ID, text=text, output_format=output_format)
+    first_chunk = await anext(audio, b"")
+    return b"".join([first_chunk] + [chunk async for chunk in audio])
+
+
+def legacy_strip_id3(data: bytes) -> bytes:
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def legacy_join_mp3(parts: list[bytes]) -> bytes:
+    return b"".join(legacy_strip_id3(part) for part in parts)
+
+
+def legacy_data_uri(summary: str, audio_bytes: bytes) -> str:
+    view = memoryview(audio_bytes)
+    parts = [base64.b64encode(view[i:i + 3 * 64 * 1024]).decode("ascii") for i in range(0, len(view), 3 * 64 * 1024)]
+    return summary + "".join(parts)
+
+
+async def legacy_get(main, key: str, size: int) -> int:
+    return len(await main.audio_cache.read(key, 0, size))
+
+
+async def drain_stream(chunks) -> int:
+    # Stands in for the response writer: each chunk is sent and dropped
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+async def peak(coro) -> int:
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = await coro
+    allocated = tracemalloc.get_traced_memory()[1] - baseline
+    del result
+    return allocated
+
+
+async def run(chars: int) -> bool:
+    start_fake_upstream(latency=0.0, chunk_size=16 * 1024)
+
+    import main
+    from audio import join_mp3
+    from offload import b64encode
+
+    # Encoding inline keeps every allocation on this thread, between the two tracemalloc reads
+    main.offloader.min_bytes = sys.maxsize
+    text = "\n\n".join([VERSE] * max(1, chars // len(VERSE)))
+    tts = main.backends["elevenlabs"]
+    audio_bytes = await main.convert(tts, text, "pcm_44100")
+    size = len(audio_bytes)
+    key = main.song_key(text, "pcm_44100", tts)
+    await main.audio_cache.put(key, bytes(audio_bytes))
+    parts = [ID3_TAG + bytes(audio_bytes[i:i + size // 4]) for i in range(0, size, size // 4)]
+    summary = f"✅ Song generated!\n🎵 Lyrics: {text[:50]}...\n📊 Size: {size} bytes\n🔗 Audio: data:audio/pcm;base64,"
+
+    async def run_sync(fn, *args):
+        return fn(*args)
+
+    async def b64_stream():
+        async for chunk in main.read_cached(key, size, main.B64_SLICE):
+            yield b"".join(b64encode(chunk))
+
+    stages = [
+        ("drain upstream", legacy_drain(main, text, "pcm_44100"), main.convert(tts, text, "pcm_44100")),
+        ("stitch mp3 parts", run_sync(legacy_join_mp3, parts), run_sync(join_mp3, parts)),
+        ("data_uri text", run_sync(legacy_data_uri, summary, audio_bytes),
+         main.song_content(text, key, audio_bytes, "data_uri", "pcm_44100")),
+        ("data_uri_block text", run_sync(legacy_data_uri, summary, audio_bytes),
+         main.song_content(text, key, audio_bytes, "data_uri_block", "pcm_44100")),
+        ("GET /songs", legacy_get(main, key, size), drain_stream(main.read_cached(key, size, main.STREAM_CHUNK_SIZE))),
+        ("GET ?encoding=base64", run_sync(lambda: len(base64.b64encode(audio_bytes))), drain_stream(b64_stream())),
+    ]
+
+    print(f"song of {size / 1e6:.1f} MB pcm_44100; peak allocation as a multiple of the audio size")
+    print(f"{'stage':24}{'before':>10}{'after':>10}")
+    tracemalloc.start()
+    results = {}
+    for name, before, after in stages:
+        results[name] = (await peak(before) / size, await peak(after) / size)
+        print(f"{name:24}{results[name][0]:>9.2f}x{results[name][1]:>9.2f}x")
+    tracemalloc.stop()
+
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+
+    # Stages that return the song should hold it about once; streamed responses only hold a few
+    # slices in flight, however long the song
+    passed = (
+        all(after <= before for before, after in results.values())
+        and results["drain upstream"][1] < 1.5
+        and results["stitch mp3 parts"][1] < 1.5
+        and results["GET /songs"][1] * size < 4 * main.STREAM_CHUNK_SIZE
+        and results["GET ?encoding=base64"][1] * size < 8 * main.B64_SLICE
+    )
+    print("✅ PASS" if passed else "❌ FAIL: a stage still copies the audio more than expected")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=1000, help="lyrics length; pcm_44100 is ~6 KB per character")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.chars)) else 1)
@@ -0,0 +1,77 @@
+# Event-loop lag while multi-MB songs are encoded, with post-processing inline vs offloaded to threads.
+# Songs are cached first, so the only work left per call is stitching/encoding; meanwhile a timer
+# measures loop lag and `health` is probed to see how long other tools are kept waiting.
+#   uv run python -m bench.offload --songs 20 --chars 1000
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+from bench.measure import LoopLagMonitor, percentiles
+
+VERSE = "Hold on, hold on, the morning's coming soon\nSing it to the rooftops, sing it to the moon"
+
+
+async def probe(client, stop: asyncio.Event) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.call_tool("health")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+    return samples
+
+
+async def run(songs: int, chars: int, output: str) -> bool:
+    start_fake_upstream(latency=0.05)
+
+    from fastmcp import Client
+    import main
+
+    verses = "\n\n".join([VERSE] * max(1, chars // len(VERSE)))
+    lyrics = [f"{verses}\n\n(take {i})" for i in range(songs)]
+    args = [{"lyrics": text, "output_format": "pcm_44100", "output": output} for text in lyrics]
+    results = {}
+    async with Client(main.mcp) as client:
+        # Synthesize once so both runs measure only the post-processing of cached songs
+        await asyncio.gather(*(client.call_tool("generate_song_base64", {**a, "output": "resource"}) for a in args))
+        size = (await client.call_tool("generate_song_base64", {**args[0], "output": "resource"})).content[1].size
+
+        print(f"{songs} songs of {size / 1e6:.1f} MB, output={output}")
+        print(f"{'post-processing':18}{'loop lag p99':>14}{'loop lag max':>14}{'health p99':>12}{'wall':>8}")
+        # One untimed pass so first-call costs (validators, allocator growth) land in neither run
+        for a in args:
+            await client.call_tool("generate_song_base64", a)
+        for mode, min_bytes in (("inline", sys.maxsize), ("offloaded", main.OFFLOAD_MIN_BYTES)):
+            main.offloader.min_bytes = min_bytes
+            lag = LoopLagMonitor(interval=0.005)
+            stop = asyncio.Event()
+            lag.start()
+            prober = asyncio.create_task(probe(client, stop))
+            start = time.perf_counter()
+            # Sequential calls keep the comparison about how long each one holds the loop
+            for a in args:
+                await client.call_tool("generate_song_base64", a)
+            wall = time.perf_counter() - start
+            stop.set()
+            health = percentiles(await prober)
+            loop = await lag.stop()
+            results[mode] = loop
+            print(f"{mode:18}{loop['p99'] * 1000:>12.1f}ms{loop['max'] * 1000:>12.1f}ms"
+                  f"{health['p99'] * 1000:>10.1f}ms{wall:>7.2f}s")
+    main.offloader.shutdown()
+    await main.audio_cache.close()
+
+    passed = results["offloaded"]["max"] < results["inline"]["max"]
+    print("✅ PASS" if passed else "❌ FAIL: offloading did not reduce loop stalls")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--songs", type=int, default=20)
+    parser.add_argument("--chars", type=int, default=1000, help="lyrics length; pcm_44100 is ~6 KB per character")
+    parser.add_argument("--output", default="data_uri", choices=["data_uri", "audio"])
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.songs, args.chars, args.output)) else 1)
@@ -0,0 +1,122 @@
+# Connection overhead of the ElevenLabs client under concurrent load, over TLS like the real API.
+# Compares a fresh client per request, the SDK's default client, and the shared ConnectionPool.
+#   uv run python -m bench.pooling --concurrency 16 --rounds 5 --rtt 0.05
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import ssl
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from elevenlabs.client import AsyncElevenLabs
+
+from bench.fake_elevenlabs import create_app, free_port, serve_in_thread, start_latency_proxy
+from bench.measure import percentiles
+from http_pool import ConnectionPool
+
+LYRICS = "Hold on, hold on, the morning's coming soon"
+
+
+def self_signed_cert(directory: Path) -> tuple[Path, Path]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = directory / "cert.pem", directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ))
+    return cert_path, key_path
+
+
+async def convert(client: AsyncElevenLabs) -> float:
+    start = time.perf_counter()
+    async for _ in client.text_to_speech.convert(voice_id="bench", text=LYRICS, model_id="bench"):
+        pass
+    return time.perf_counter() - start
+
+
+async def run_mode(mode: str, base_url: str, context: ssl.SSLContext, concurrency: int, rounds: int, idle: float) -> dict:
+    http = None
+    shared = None
+    if mode == "pooled":
+        http = ConnectionPool(max_connections=concurrency, max_keepalive=concurrency, verify=context).client
+    elif mode == "default":
+        # What AsyncElevenLabs builds for itself: httpx defaults of 20 idle connections kept for 5s
+        http = httpx.AsyncClient(verify=context, timeout=60)
+    if http:
+        shared = AsyncElevenLabs(api_key="fake", base_url=base_url, httpx_client=http)
+
+    async def one() -> float:
+        if shared:
+            return await convert(shared)
+        async with httpx.AsyncClient(verify=context, timeout=60) as fresh:
+            return await convert(AsyncElevenLabs(api_key="fake", base_url=base_url, httpx_client=fresh))
+
+    # The first round opens connections for everyone; later rounds show what reuse buys
+    cold = await asyncio.gather(*(one() for _ in range(concurrency)))
+    warm = []
+    for _ in range(rounds - 1):
+        if idle:
+            await asyncio.sleep(idle)
+        warm += await asyncio.gather(*(one() for _ in range(concurrency)))
+    if http:
+        await http.aclose()
+    return {"cold": cold, "warm": warm}
+
+
+async def run(concurrency: int, rounds: int, latency: float, rtt: float, idle: float) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_cert(Path(directory))
+        app = create_app(latency=latency, chunk_size=4096, chunks=4)
+        port = free_port()
+        serve_in_thread(app, port, ssl_certfile=str(cert_path), ssl_keyfile=str(key_path), timeout_keep_alive=300)
+        context = ssl.create_default_context(cafile=str(cert_path))
+        base_url = f"https://127.0.0.1:{start_latency_proxy(port, rtt) if rtt else port}"
+
+        results = {}
+        print(f"{'client':10}{'requests':>10}{'connections':>13}{'cold p50':>11}{'warm p50':>11}{'warm p99':>11}")
+        for mode in ("fresh", "default", "pooled"):
+            app.state.peers.clear()
+            result = await run_mode(mode, base_url, context, concurrency, rounds, idle)
+            cold, warm = percentiles(result["cold"]), percentiles(result["warm"])
+            results[mode] = {"connections": len(app.state.peers), "warm_p50": warm["p50"]}
+            print(f"{mode:10}{concurrency * rounds:>10}{len(app.state.peers):>13}{cold['p50'] * 1000:>9.1f}ms"
+                  f"{warm['p50'] * 1000:>9.1f}ms{warm['p99'] * 1000:>9.1f}ms")
+
+    # The pool opens one connection per concurrent request, then every later round reuses them
+    pooled, fresh = results["pooled"], results["fresh"]
+    passed = pooled["connections"] <= concurrency and pooled["warm_p50"] < fresh["warm_p50"]
+    print("✅ PASS" if passed else "❌ FAIL: pooled client did not reuse connections")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake synthesis time, kept short so setup cost shows")
+    parser.add_argument("--rtt", type=float, default=0.05, help="network round trip to emulate; 0 talks to the fake directly")
+    parser.add_argument("--idle", type=float, default=0.0, help="pause between rounds; over 5s shows the default keep-alive expiring")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.concurrency, args.rounds, args.latency, args.rtt, args.idle)) else 1)
@@ -0,0 +1,116 @@
+# Songs sent at once to an account with ElevenLabs-style limits (requests in flight, characters per
+# minute): submitted blindly, where 429s are only retried, against paced by the quota scheduler, first
+# in arrival order and then shortest first. Short songs are one line, long ones a dozen. Hedging is on
+# throughout: a hedge must find its own room in the account's limits or not go out at all.
+#   uv run python -m bench.quota --short 60 --long 10 --max-concurrency 4 --chars-per-minute 12000
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+from bench.measure import percentiles
+
+LINE = "Hold on, hold on, the morning's coming soon"
+
+
+async def run(short: int, long: int, max_concurrency: int, chars_per_minute: int, latency: float) -> bool:
+    upstream = start_fake_upstream(latency=latency, latency_per_char=0.001, max_concurrency=max_concurrency, chars_per_minute=chars_per_minute)
+    # Every song is admitted at once and each is one upstream request, so only quota pacing decides the order
+    calls = short + long
+    os.environ["MAX_SYNTHESES_PER_CALLER"] = str(calls)
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = str(calls)
+    os.environ["CHUNK_MAX_CHARS"] = "0"
+    # Hedging as eager as it gets, so any hedge sent past the account's limits shows up as 429s
+    os.environ["HEDGE_BUDGET"] = "1"
+    os.environ["HEDGE_QUANTILE"] = "0.5"
+    os.environ["HEDGE_MIN_SAMPLES"] = "5"
+    os.environ["ELEVENLABS_CHARS_PER_MINUTE"] = str(chars_per_minute)
+
+    from fastmcp import Client
+    import main
+
+    scheduler = main.quota_scheduler
+    hooks = main.http_pool.client.event_hooks["response"]
+    results = {}
+    async with Client(main.mcp) as client:
+        async def song(lyrics: str) -> tuple[float, bool]:
+            start = time.perf_counter()
+            result = await client.call_tool("generate_song_base64", {"lyrics": lyrics, "output_format": "mp3_22050_32", "output": "resource"})
+            return time.perf_counter() - start, result.content[0].text.startswith("✅")
+
+        print(f"{short} short + {long} long songs at once; account allows {max_concurrency} in flight, {chars_per_minute} chars/minute")
+        print(f"{'mode':10}{'wall':>8}{'failed':>8}{'429s':>6}{'hedged':>8}{'skipped':>9}{'short p50':>11}{'short p95':>11}{'long p50':>10}{'long p95':>10}")
+        for number, mode in enumerate(("blind", "fifo", "shortest")):
+            if mode == "blind":
+                # No limits known and none learned: everything goes out, 429s are retried with backoff
+                scheduler.chars_per_minute = 0
+                scheduler.account_concurrency = 0
+                hooks.remove(scheduler.on_response)
+            else:
+                scheduler.chars_per_minute = chars_per_minute
+                scheduler.aging = 1e9 if mode == "fifo" else 100.0
+                if scheduler.on_response not in hooks:
+                    hooks.append(scheduler.on_response)
+                    # One request teaches the scheduler the account's concurrency, as warm-up traffic would
+                    await song(f"{LINE} ({mode} probe)")
+            # Each mode starts with a full minute of characters, here and upstream
+            scheduler.tokens = upstream.state.tokens = float(chars_per_minute)
+            scheduler.paused_until = 0.0
+            upstream.state.refilled_at = time.monotonic()
+            throttled = upstream.state.throttled
+            hedges = main.router.totals()
+
+            # Numbered rather than named by mode, so every mode sends the same number of characters
+            lyrics = [(f"{LINE} ({number}.{i:03})", "short") for i in range(short)]
+            lyrics += [("\n".join(f"{LINE} ({number}.{i:03}.{n:02})" for n in range(12)), "long") for i in range(long)]
+            # Long songs arrive first, the worst case for arrival order
+            lyrics.sort(key=lambda item: item[1] != "long")
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(*(song(text) for text, _ in lyrics))
+            wall = time.perf_counter() - start
+
+            by_kind = {kind: [seconds * 1000 for (seconds, ok), (_, k) in zip(outcomes, lyrics) if k == kind and ok] for kind in ("short", "long")}
+            stats = {kind: percentiles(values) if values else {"p50": float("nan"), "p95": float("nan")} for kind, values in by_kind.items()}
+            failed = sum(not ok for _, ok in outcomes)
+            hedged = main.router.totals()["hedged"] - hedges["hedged"]
+            skipped = main.router.totals()["hedges_skipped"] - hedges["hedges_skipped"]
+            results[mode] = {"failed": failed, "throttled": upstream.state.throttled - throttled, "short_p50": stats["short"]["p50"]}
+            print(f"{mode:10}{wall:>7.1f}s{failed:>8}{results[mode]['throttled']:>6}{hedged:>8}{skipped:>9}"
+                  f"{stats['short']['p50']:>9.0f}ms{stats['short']['p95']:>9.0f}ms{stats['long']['p50']:>8.0f}ms{stats['long']['p95']:>8.0f}ms")
+
+        report = json.loads((await client.call_tool("quota")).content[0].text)
+    print(json.dumps(report))
+
+    await main.job_queue.close()
+    main.offloader.shutdown()
+    await main.http_pool.aclose()
+    await main.audio_cache.close()
+
+    # Pacing should all but end the 429s and the failed songs they cause; shortest first should get
+    # the short songs out well before arrival order does, and no slot may be left taken, hedges' included
+    plan = report["subscription"]
+    passed = (
+        results["blind"]["throttled"] > 0
+        and all(results[mode]["failed"] == 0 for mode in ("fifo", "shortest"))
+        and all(results[mode]["throttled"] <= results["blind"]["throttled"] / 10 for mode in ("fifo", "shortest"))
+        and results["shortest"]["short_p50"] < results["fifo"]["short_p50"]
+        and report["pacing"]["account_concurrency"] == max_concurrency
+        and report["pacing"]["active"] == 0
+        and plan["characters_remaining"] == plan["character_limit"] - upstream.state.characters
+    )
+    print("✅ PASS" if passed else "❌ FAIL: pacing did not prevent throttling or favour short songs")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--short", type=int, default=60)
+    parser.add_argument("--long", type=int, default=10)
+    parser.add_argument("--max-concurrency", type=int, default=4, help="requests the fake account allows in flight")
+    parser.add_argument("--chars-per-minute", type=int, default=12000, help="characters the fake account allows per minute")
+    parser.add_argument("--latency", type=float, default=0.1, help="fake upstream time to first byte, before the per-character cost")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.short, args.long, args.max_concurrency, args.chars_per_minute, args.latency)) else 1)
@@ -0,0 +1,116 @@
+# Failure-injection check for the upstream retry layer and circuit breaker: transient 503s, 429s whose
+# retry-after / retry-after-ms must be waited out, one asking for longer than UPSTREAM_MAX_BACKOFF,
+# a 4xx that must not be retried, and finally upstream down.
+#   uv run python -m bench.resilience
+import asyncio
+import json
+import os
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+
+
+def retry_gaps(attempts: list[tuple[float, str, int]], since: int, status: int) -> list[float]:
+    # Seconds from each `status` answer to the next attempt at the same text
+    last: dict[str, tuple[float, int]] = {}
+    gaps = []
+    for at, text, answered in attempts[since:]:
+        if text in last and last[text][1] == status:
+            gaps.append(at - last[text][0])
+        last[text] = (at, answered)
+    return gaps
+
+
+async def run() -> bool:
+    upstream = start_fake_upstream(latency=0.05, error_rate=0.3, seed=7)
+    os.environ["UPSTREAM_ATTEMPTS"] = "5"
+    os.environ["UPSTREAM_MAX_BACKOFF"] = "2"
+    # One upstream request per attempt, so attempts can be counted
+    os.environ["HEDGE_BUDGET"] = "0"
+    os.environ["CIRCUIT_WINDOW"] = "2"
+    os.environ["MAX_SYNTHESES_PER_CALLER"] = "64"
+    os.environ["MAX_CONCURRENT_SYNTHESES"] = "64"
+
+    from fastmcp import Client
+    import main
+
+    ok = True
+    async with Client(main.mcp) as client:
+        # 30% of upstream calls fail: retries should hide every one of them
+        results = await asyncio.gather(*[
+            client.call_tool("generate_song_base64", {"lyrics": f"flaky song {i} with enough words"})
+            for i in range(40)
+        ])
+        failed = [r.content[0].text for r in results if not r.content[0].text.startswith("✅")]
+        print(f"🌧️  flaky upstream: {40 - len(failed)}/40 succeeded, {main.upstream.retries} retries")
+        ok &= not failed
+
+        # Throttled: retried no sooner than retry-after (or retry-after-ms) says, and the breaker does not
+        # count it against upstream health
+        upstream.state.error_rate = 0.0
+        upstream.state.error_status = 429
+        upstream.state.fail_first = 1
+        for header, wait in (("retry-after", 0.3), ("retry-after-ms", 0.25)):
+            upstream.state.retry_after_header = header
+            upstream.state.retry_after = wait
+            since = len(upstream.state.attempts)
+            results = await asyncio.gather(*[
+                client.call_tool("generate_song_base64", {"lyrics": f"throttled song {header} {i} with enough words"})
+                for i in range(10)
+            ])
+            failed = [r.content[0].text for r in results if not r.content[0].text.startswith("✅")]
+            gaps = retry_gaps(upstream.state.attempts, since, 429)
+            print(f"🐢 429 with {header} {wait:g}s: {10 - len(failed)}/10 succeeded, {len(gaps)} retries, "
+                  f"shortest wait {min(gaps, default=float('nan')):.3f}s, circuit {main.upstream.breaker.state}")
+            for text in failed:
+                print(f"   {text}")
+            ok &= not failed and len(gaps) == 10 and min(gaps) >= wait and main.upstream.breaker.state == "closed"
+        upstream.state.fail_first = 0
+
+        # Asked to wait longer than UPSTREAM_MAX_BACKOFF: fail now rather than hold the caller
+        upstream.state.error_rate = 1.0
+        upstream.state.retry_after_header = "retry-after"
+        upstream.state.retry_after = 5.0
+        since = len(upstream.state.attempts)
+        start = time.perf_counter()
+        result = await client.call_tool("generate_song_base64", {"lyrics": "patient song that would wait too long"})
+        elapsed = time.perf_counter() - start
+        sent = len(upstream.state.attempts) - since
+        print(f"⌛ 429 with retry-after 5s over a 2s cap: {sent} attempt, failed in {elapsed * 1000:.0f} ms")
+        ok &= not result.content[0].text.startswith("✅") and sent == 1 and elapsed < 1.0
+        # The 429 also paused quota pacing for those 5s; nothing else here should wait on it
+        main.quota_scheduler.paused_until = 0.0
+
+        # A rejected request is the caller's problem: not retried, and upstream still counts as healthy
+        upstream.state.error_status = 422
+        upstream.state.retry_after = None
+        since = len(upstream.state.attempts)
+        result = await client.call_tool("generate_song_base64", {"lyrics": "invalid song that upstream rejects outright"})
+        sent = len(upstream.state.attempts) - since
+        print(f"🚫 422: {sent} attempt, circuit {main.upstream.breaker.state}")
+        ok &= not result.content[0].text.startswith("✅") and sent == 1 and main.upstream.breaker.state == "closed"
+
+        # Upstream hard down: the breaker opens and later calls fail fast
+        await asyncio.sleep(2.1)
+        upstream.state.error_status = 503
+        await asyncio.gather(*[
+            client.call_tool("generate_song_base64", {"lyrics": f"doomed song {i} with enough words"})
+            for i in range(10)
+        ])
+        start = time.perf_counter()
+        result = await client.call_tool("generate_song_base64", {"lyrics": "fast failure song with enough words"})
+        elapsed = time.perf_counter() - start
+        print(f"⛔ upstream down: circuit {main.upstream.breaker.state}, next call failed in {elapsed * 1000:.1f} ms")
+        print(f"   {result.content[0].text}")
+        ok &= main.upstream.breaker.state == "open" and "CircuitOpen" in result.content[0].text and elapsed < 0.1
+
+        print(json.dumps(main.upstream.stats()))
+    await main.audio_cache.close()
+    return ok
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(run())
+    print("✅ PASS" if ok else "❌ FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,156 @@
+# Benchmark suite: runs the MCP server in-process against the fake ElevenLabs upstream and reports
+# throughput, latency percentiles, peak RSS and event-loop lag per tool.
+#   uv run python -m bench.suite --requests 200 --concurrency 20 --output bench/results.json
+#   uv run python -m bench.suite --compare bench/results.json
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+from bench.fake_elevenlabs import start_fake_upstream
+from bench.measure import LoopLagMonitor, peak_rss_mb, percentiles
+
+LYRICS = "\n".join([
+    "We were running through the city lights tonight",
+    "Every window burning gold and every street alive",
+    "Hold on, hold on, the morning's coming soon",
+    "Sing it to the rooftops, sing it to the moon",
+])
+
+# Lower is better for every metric except throughput
+COMPARED = [("throughput_rps", True), ("latency_ms.p50", False), ("latency_ms.p95", False),
+            ("latency_ms.p99", False), ("loop_lag_ms.p99", False), ("peak_rss_mb", False)]
+
+
+def song_args(unique: float, requests: int):
+    # unique=1.0 gives every call its own lyrics (all cache misses); lower values cycle through fewer songs
+    distinct = max(1, round(requests * unique))
+    for i in itertools.count():
+        yield {"lyrics": f"{LYRICS}\n(take {i % distinct})"}
+
+
+async def scenario(client, tool: str, args, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+    lag = LoopLagMonitor()
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            start = time.perf_counter()
+            result = await client.call_tool(tool, next(args), raise_on_error=False)
+            latencies.append(time.perf_counter() - start)
+            text = result.content[0].text if result.content else ""
+            if result.is_error or text.startswith(("❌", "⏳")):
+                errors += 1
+
+    lag.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    lag_stats = await lag.stop()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(requests / wall, 2),
+        "latency_ms": {k: round(v * 1000, 3) for k, v in percentiles(latencies).items()},
+        "loop_lag_ms": {k: round(v * 1000, 3) for k, v in lag_stats.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run(config: argparse.Namespace) -> dict:
+    start_fake_upstream(
+        latency=config.latency,
+        chunk_size=config.chunk_size,
+        error_rate=config.error_rate,
+        bandwidth=config.bandwidth,
+        seed=1,
+    )
+
+    # Measure raw capacity rather than admission policy, unless the environment says otherwise
+    os.environ.setdefault("MAX_CONCURRENT_SYNTHESES", str(config.concurrency))
+    os.environ.setdefault("MAX_SYNTHESES_PER_CALLER", str(config.concurrency))
+
+    from fastmcp import Client
+    import main
+
+    results = {}
+    async with Client(main.mcp) as client:
+        for tool, args in [
+            ("health", itertools.repeat({})),
+            ("validate", itertools.repeat({})),
+            ("generate_song_base64", song_args(config.unique, config.requests)),
+        ]:
+            results[tool] = await scenario(client, tool, args, config.requests, config.concurrency)
+            print(f"⏱️  {tool:22} {results[tool]['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {results[tool]['latency_ms']['p50']:>8.2f} ms  "
+                  f"p99 {results[tool]['latency_ms']['p99']:>8.2f} ms  "
+                  f"lag p99 {results[tool]['loop_lag_ms']['p99']:>6.2f} ms  "
+                  f"rss {results[tool]['peak_rss_mb']:>6.1f} MB  errors {results[tool]['errors']}")
+    await main.audio_cache.close()
+
+    return {
+        "config": {k: v for k, v in vars(config).items() if k not in ("output", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+
+
+def lookup(result: dict, path: str) -> float:
+    for part in path.split("."):
+        result = result[part]
+    return result
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for tool, result in current["results"].items():
+        if tool not in baseline["results"]:
+            continue
+        for metric, higher_is_better in COMPARED:
+            new, old = lookup(result, metric), lookup(baseline["results"][tool], metric)
+            if not old:
+                continue
+            change = (new - old) / old
+            regressed = -change > tolerance if higher_is_better else change > tolerance
+            # Sub-millisecond timings are noise, not regressions
+            if metric != "throughput_rps" and metric != "peak_rss_mb" and abs(new - old) < 1:
+                regressed = False
+            ok &= not regressed
+            print(f"{'❌' if regressed else '  '} {tool:22} {metric:16} {old:>10.2f} → {new:>10.2f} ({change:+.0%})")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the song generator against a fake ElevenLabs")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="upstream time to first byte, seconds")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="upstream chunk size, bytes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="upstream link speed in bytes/second, 0 = unlimited")
+    parser.add_argument("--unique", type=float, default=1.0, help="fraction of songs with distinct lyrics")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    config = parser.parse_args()
+
+    report = asyncio.run(run(config))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to {config.output}")
+    if config.compare:
+        with open(config.compare) as f:
+            ok = compare(report, json.load(f), config.tolerance)
+        print("✅ No regressions" if ok else "❌ Regressions found")
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,113 @@
+# First-request latency of a freshly started server, with and without the startup warm-up. Each run
+# starts `python main.py` as a subprocess against the fake upstream (behind an RTT-emulating proxy, so
+# new connections cost what they would against the real API), waits for /ready and times the first
+# tools/call: either a song from the WARMUP_LYRICS list or one the server has never seen.
+#   uv run python -m bench.warmup --rtt 0.05
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.fake_elevenlabs import free_port, start_latency_proxy
+from bench.workers import start, wait_for_port
+
+HOT = [
+    "We were running through the city lights tonight\nEvery window burning gold and every street alive",
+    "Hold on, hold on, the morning's coming soon\nSing it to the rooftops, sing it to the moon",
+    "Slow down the river, let the evening in\nSing it low and easy, let the night begin",
+]
+HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+async def call(client: httpx.AsyncClient, port: int, lyrics: str) -> float:
+    body = {
+        "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+        "params": {"name": "generate_song_base64", "arguments": {"lyrics": lyrics, "output": "resource"}},
+    }
+    start = time.perf_counter()
+    response = await client.post(f"http://127.0.0.1:{port}/mcp/", json=body, headers=HEADERS)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200 and "Song generated" in response.text, response.text[:300]
+    return elapsed
+
+
+async def wait_ready(client: httpx.AsyncClient, port: int, timeout: float = 60.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get(f"http://127.0.0.1:{port}/ready")
+        if response.status_code == 200:
+            return response.json()
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"server not ready after {timeout:g}s")
+
+
+async def measure(upstream_url: str, warmup: bool, first: str, steady: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        lyrics_path = os.path.join(directory, "hot.json")
+        with open(lyrics_path, "w") as f:
+            json.dump(HOT, f)
+        port = free_port()
+        launched = time.perf_counter()
+        server = start(["main.py"], {
+            "PORT": str(port),
+            "FASTMCP_STATELESS_HTTP": "true",
+            "ELEVENLABS_API_KEY": "fake",
+            "ELEVENLABS_BASE_URL": upstream_url,
+            "CACHE_PATH": os.path.join(directory, "songs.db"),
+            "JOBS_PATH": os.path.join(directory, "jobs.db"),
+            "WARMUP": "1" if warmup else "0",
+            "WARMUP_LYRICS": lyrics_path,
+        })
+        try:
+            wait_for_port(port)
+            async with httpx.AsyncClient(timeout=60) as client:
+                state = await wait_ready(client, port)
+                ready = time.perf_counter() - launched
+                lyrics = HOT[0] if first == "hot" else f"A brand new song nobody asked for yet\nTake {time.time_ns()}"
+                first_call = await call(client, port, lyrics)
+                later = [await call(client, port, f"{HOT[1]}\n(take {i} {time.time_ns()})") for i in range(steady)]
+        finally:
+            server.terminate()
+            server.wait()
+    return {"ready": ready, "first": first_call, "steady": statistics.median(later), "steps": state["steps"]}
+
+
+async def run(rtt: float, latency: float, steady: int) -> bool:
+    upstream_port = free_port()
+    upstream = start(["-m", "bench.fake_elevenlabs", "--port", str(upstream_port), "--latency", str(latency)], {})
+    try:
+        wait_for_port(upstream_port)
+        proxy_port = start_latency_proxy(upstream_port, rtt)
+        upstream_url = f"http://127.0.0.1:{proxy_port}"
+        print(f"upstream {latency * 1000:.0f}ms synthesis, {rtt * 1000:.0f}ms RTT; {len(HOT)} hot songs")
+        print(f"{'startup':10}{'first call':>12}{'ready after':>13}{'first':>10}{'steady':>10}")
+        results = {}
+        for warmup in (False, True):
+            for first in ("hot", "novel"):
+                result = await measure(upstream_url, warmup, first, steady)
+                mode = "warm" if warmup else "cold"
+                results[mode, first] = result
+                print(f"{mode:10}{first:>12}{result['ready']:>12.2f}s{result['first'] * 1000:>8.0f}ms{result['steady'] * 1000:>8.0f}ms")
+        print(f"warm-up steps: {json.dumps(results['warm', 'hot']['steps'])}")
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+    passed = all(results["warm", first]["first"] < results["cold", first]["first"] for first in ("hot", "novel"))
+    print("✅ PASS" if passed else "❌ FAIL: warming up did not speed up the first request")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt", type=float, default=0.05, help="round-trip time added to the upstream link")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake upstream synthesis time")
+    parser.add_argument("--steady", type=int, default=5, help="novel calls after the first, for the steady-state median")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.rtt, args.latency, args.steady)) else 1)
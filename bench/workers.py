@@ -0,0 +1,122 @@
+# Throughput of the real HTTP server at different WEB_CONCURRENCY settings. Starts the fake upstream and
+# `python main.py` as subprocesses and sends tools/call requests over streamable HTTP, each returning a
+# multi-MB data URI so base64 encoding and response writing dominate.
+#   uv run python -m bench.workers --workers 1 2 4 --requests 200 --concurrency 32
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.fake_elevenlabs import free_port
+from bench.measure import percentiles
+
+# ~200 characters of pcm_44100 is about 1.2 MB of audio, 1.6 MB once base64-encoded
+LYRICS = "\n".join([
+    "We were running through the city lights tonight",
+    "Every window burning gold and every street alive",
+    "Hold on, hold on, the morning's coming soon",
+    "Sing it to the rooftops, sing it to the moon",
+])
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout:g}s")
+
+
+def start(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def load(port: int, requests: int, concurrency: int, output_format: str) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    received = 0
+    pending = iter(range(requests))
+    headers = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors, received
+        for i in pending:
+            # Distinct lyrics per call so every request pays for synthesis and encoding
+            body = {
+                "jsonrpc": "2.0", "id": i, "method": "tools/call",
+                "params": {"name": "generate_song_base64", "arguments": {
+                    "lyrics": f"{LYRICS}\n(take {time.time_ns()}-{i})", "output_format": output_format,
+                }},
+            }
+            start = time.perf_counter()
+            response = await client.post(f"http://127.0.0.1:{port}/mcp/", json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            received += len(response.content)
+            if response.status_code != 200 or "Song generated" not in response.text[:400]:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return {
+        "throughput_rps": requests / wall,
+        "mb_per_second": received / wall / 1e6,
+        "errors": errors,
+        **{key: value * 1000 for key, value in percentiles(latencies).items()},
+    }
+
+
+async def run(workers: list[int], requests: int, concurrency: int, latency: float, output_format: str) -> None:
+    upstream_port = free_port()
+    upstream = start(["-m", "bench.fake_elevenlabs", "--port", str(upstream_port), "--latency", str(latency)], {})
+    try:
+        wait_for_port(upstream_port)
+        print(f"cpus: {os.cpu_count()}, {requests} requests at concurrency {concurrency}, {output_format}")
+        print(f"{'workers':>8}{'req/s':>9}{'MB/s':>9}{'p50':>10}{'p99':>10}{'errors':>8}")
+        for count in workers:
+            with tempfile.TemporaryDirectory() as directory:
+                port = free_port()
+                server = start(["main.py"], {
+                    "PORT": str(port),
+                    "WEB_CONCURRENCY": str(count),
+                    # A single process runs main() directly; stateless sessions keep the raw requests valid
+                    "FASTMCP_STATELESS_HTTP": "true",
+                    "ELEVENLABS_API_KEY": "fake",
+                    "ELEVENLABS_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+                    "CACHE_PATH": os.path.join(directory, "songs.db"),
+                    "JOBS_PATH": os.path.join(directory, "jobs.db"),
+                    "MAX_CONCURRENT_SYNTHESES": str(concurrency),
+                    "MAX_SYNTHESES_PER_CALLER": str(concurrency),
+                })
+                try:
+                    wait_for_port(port)
+                    await load(port, min(concurrency, requests), concurrency, output_format)  # warm-up
+                    result = await load(port, requests, concurrency, output_format)
+                finally:
+                    server.terminate()
+                    server.wait()
+            print(f"{count:>8}{result['throughput_rps']:>9.1f}{result['mb_per_second']:>9.1f}"
+                  f"{result['p50']:>8.0f}ms{result['p99']:>8.0f}ms{result['errors']:>8}")
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream synthesis time")
+    parser.add_argument("--output-format", default="pcm_44100")
+    args = parser.parse_args()
+    asyncio.run(run(args.workers, args.requests, args.concurrency, args.latency, args.output_format))
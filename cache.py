@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import json
+import time
+
+import aiosqlite
+
+
+def cache_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Content-addressed audio store; least recently used entries are evicted past max_bytes
+class AudioCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                # Worker processes share the file; wait for their writes instead of failing
+                await db.execute("PRAGMA busy_timeout=5000")
+                await db.execute(
+                    "CREATE TABLE IF NOT EXISTS audio ("
+                    "key TEXT PRIMARY KEY, data BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                # Covers the eviction query, which would otherwise read past every blob to reach its size
+                await db.execute("DROP INDEX IF EXISTS audio_lru")
+                await db.execute("CREATE INDEX IF NOT EXISTS audio_lru_size ON audio (last_access, key, size)")
+                await db.commit()
+                self._db = db
+        return self._db
+
+    async def get(self, key: str) -> bytes | None:
+        db = await self._connect()
+        async with db.execute("SELECT data FROM audio WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        await db.execute("UPDATE audio SET last_access = ? WHERE key = ?", (time.time(), key))
+        await db.commit()
+        return row[0]
+
+    async def size(self, key: str) -> int | None:
+        db = await self._connect()
+        async with db.execute("SELECT size FROM audio WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def read(self, key: str, offset: int, length: int) -> bytes | None:
+        # Byte range straight out of sqlite, without loading the whole blob
+        db = await self._connect()
+        async with db.execute("SELECT substr(data, ?, ?) FROM audio WHERE key = ?", (offset + 1, length, key)) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        db = await self._connect()
+        await db.execute(
+            "INSERT OR REPLACE INTO audio (key, data, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time()),
+        )
+        # Drop everything beyond max_bytes, counting from the most recently used entry. Summing the
+        # index first skips ranking every entry on the many puts that leave the cache under budget
+        async with db.execute("SELECT COALESCE(SUM(size), 0) FROM audio") as cursor:
+            (total,) = await cursor.fetchone()
+        if total > self.max_bytes:
+            cursor = await db.execute(
+                "DELETE FROM audio WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running FROM audio) "
+                "WHERE running > ?)",
+                (self.max_bytes,),
+            )
+            self.evictions += cursor.rowcount
+        await db.commit()
+
+    async def stats(self) -> dict:
+        db = await self._connect()
+        async with db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio") as cursor:
+            entries, size = await cursor.fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
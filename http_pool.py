@@ -0,0 +1,75 @@
+import asyncio
+import ssl
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (optional: pip install "httpx[http2]")
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# One long-lived httpx client for every ElevenLabs call, so TCP and TLS setup is paid once per
+# connection instead of once per request. Counts what the pool actually does so reuse is visible.
+class ConnectionPool:
+    def __init__(
+        self,
+        max_connections: int = 32,
+        max_keepalive: int = 32,
+        keepalive_expiry: float = 120.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        http2: bool = False,
+        verify: ssl.SSLContext | bool = True,
+    ):
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=read_timeout)
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=self.timeout,
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        # The SDK passes one flat timeout per request; restore the split connect/read timeouts
+        request.extensions["timeout"] = self.timeout.as_dict()
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def warm(self, url: str, connections: int) -> int:
+        # Opens connections ahead of the first real request. Any answer, even an error status, leaves
+        # its connection in the pool; concurrent requests make HTTP/1.1 open one each
+        opened = self.connections_opened
+        results = await asyncio.gather(*(self.client.head(url) for _ in range(connections)), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return self.connections_opened - opened
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "requests_per_connection": round(self.requests / max(self.connections_opened, 1), 2),
+        }
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import secrets
+import sys
+import time
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+from admission import Busy
+
+COLUMNS = (
+    "id", "caller", "idempotency_key", "lyrics", "output_format", "status", "song_key", "size", "error",
+    "attempts", "run_after", "lease_until", "created_at", "started_at", "finished_at", "backend",
+)
+
+# Added after the first release of the jobs table; older databases get them on connect
+MIGRATIONS = {
+    "idempotency_key": "TEXT",
+    "run_after": "REAL NOT NULL DEFAULT 0",
+    "lease_until": "REAL",
+    "backend": "TEXT",
+}
+
+ANONYMOUS = "anonymous"  # caller id shared by every request without a bearer token
+
+
+def caller_digest(token: str) -> str:
+    # Callers are stored, and told apart, by a digest of their token; the token itself is a credential
+    return "sha256:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# Job rows live in sqlite and are the queue itself: workers claim rows with a lease, so jobs
+# survive a restart and a job whose worker died is picked up again once its lease runs out
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._db: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                # Other server processes may share the file; wait for their writes instead of failing
+                await db.execute("PRAGMA busy_timeout=5000")
+                await db.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "id TEXT PRIMARY KEY, caller TEXT NOT NULL, lyrics TEXT NOT NULL, "
+                    "output_format TEXT NOT NULL, status TEXT NOT NULL, song_key TEXT, size INTEGER, "
+                    "error TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, "
+                    "started_at REAL, finished_at REAL)"
+                )
+                async with db.execute("PRAGMA table_info(jobs)") as cursor:
+                    existing = {row[1] for row in await cursor.fetchall()}
+                for column, declaration in MIGRATIONS.items():
+                    if column not in existing:
+                        await db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {declaration}")
+                # Rows from before callers were digested still hold raw bearer tokens
+                async with db.execute(
+                    "SELECT DISTINCT caller FROM jobs WHERE caller NOT LIKE 'sha256:%' AND caller != ?", (ANONYMOUS,),
+                ) as cursor:
+                    tokens = [row[0] for row in await cursor.fetchall()]
+                await db.executemany("UPDATE jobs SET caller = ? WHERE caller = ?", [(caller_digest(t), t) for t in tokens])
+                await db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after, created_at)")
+                await db.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs (caller, idempotency_key) "
+                    "WHERE idempotency_key IS NOT NULL"
+                )
+                await db.commit()
+                self._db = db
+        return self._db
+
+    async def create(
+        self, caller: str, lyrics: str, output_format: str, idempotency_key: str | None = None, backend: str | None = None,
+    ) -> tuple[dict, bool]:
+        # Returns the job and whether it is new; a repeated idempotency key returns the original job
+        job = dict.fromkeys(COLUMNS)
+        job.update(
+            id=secrets.token_hex(8), caller=caller, idempotency_key=idempotency_key, lyrics=lyrics,
+            output_format=output_format, status="queued", attempts=0, run_after=0.0, created_at=time.time(), backend=backend,
+        )
+        db = await self._connect()
+        try:
+            await db.execute(
+                f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                tuple(job[column] for column in COLUMNS),
+            )
+        except aiosqlite.IntegrityError:
+            # The failed insert leaves a write transaction open, holding the lock other processes need
+            await db.rollback()
+            async with db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE caller = ? AND idempotency_key = ?",
+                (caller, idempotency_key),
+            ) as cursor:
+                existing = dict(zip(COLUMNS, await cursor.fetchone()))
+            if (existing["lyrics"], existing["output_format"], existing["backend"]) != (lyrics, output_format, backend):
+                raise ValueError(f"idempotency key {idempotency_key!r} was already used for a different song")
+            return existing, False
+        await db.commit()
+        return job, True
+
+    async def get(self, job_id: str) -> dict | None:
+        db = await self._connect()
+        async with db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)) as cursor:
+            row = await cursor.fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    async def claim(self, lease: float) -> dict | None:
+        # Oldest ready job, or a running one whose worker stopped renewing its lease (crash, redeploy)
+        now = time.time()
+        db = await self._connect()
+        # Fetched in one step: a RETURNING statement left open would block other coroutines' commits
+        rows = await db.execute_fetchall(
+            f"UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, lease_until = ? "
+            f"WHERE id = (SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+            f"OR (status = 'running' AND lease_until < ?) ORDER BY created_at LIMIT 1) "
+            f"RETURNING {', '.join(COLUMNS)}",
+            (now, now + lease, now, now),
+        )
+        await db.commit()
+        return dict(zip(COLUMNS, rows[0])) if rows else None
+
+    async def update(self, job_id: str, **fields) -> None:
+        db = await self._connect()
+        await db.execute(
+            f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in fields)} WHERE id = ?",
+            (*fields.values(), job_id),
+        )
+        await db.commit()
+
+    async def position(self, job: dict) -> int | None:
+        if job["status"] != "queued":
+            return None
+        db = await self._connect()
+        async with db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?", (job["created_at"],)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def counts(self) -> dict:
+        db = await self._connect()
+        async with db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status") as cursor:
+            return dict(await cursor.fetchall())
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+# A pool of workers that claim jobs from the store. Delivery is at least once: a job is only
+# finished once its result is recorded, so a worker lost mid-song means the song is made again.
+# A job whose caller is over its admission allowance goes back in the queue instead of failing.
+class JobQueue:
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[dict], Awaitable[tuple[str, int]]],
+        workers: int = 4,
+        lease: float = 30.0,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self.run = run
+        self.workers = workers
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.recovered = 0
+        self.errors = 0
+        self.queued = 0
+        self._running: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        # Called at startup so jobs left by a previous process resume without waiting for a new one
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(
+        self, caller: str, lyrics: str, output_format: str, idempotency_key: str | None = None, backend: str | None = None,
+    ) -> tuple[dict, bool]:
+        self.start()
+        job, created = await self.store.create(caller, lyrics, output_format, idempotency_key, backend)
+        if created:
+            self.submitted += 1
+            self.queued += 1
+            self._wakeup.set()
+        else:
+            self.deduplicated += 1
+        return job, created
+
+    async def _worker(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await self._step()
+                failures = 0
+            except Exception as e:
+                # A store error (a locked or full database, say) must not end the worker: log it and back off.
+                # A job it cut short keeps its lease, so it is claimed again once that runs out
+                failures += 1
+                self.errors += 1
+                print(f"❌ Job worker error: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+                await asyncio.sleep(min(self.retry_delay * 2 ** (failures - 1), self.lease))
+
+    async def _step(self) -> None:
+        self._wakeup.clear()
+        job = await self.store.claim(self.lease)
+        if job is None:
+            self.queued = (await self.store.counts()).get("queued", 0)
+            # Retries scheduled for later and other processes' expired leases are found by polling
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+            return
+        self.queued = max(self.queued - 1, 0)
+        self._running.add(job["id"])
+        try:
+            await self._process(job)
+        finally:
+            self._running.discard(job["id"])
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.update(job_id, lease_until=time.time() + self.lease)
+            except Exception as e:
+                # Two more tries before the lease runs out
+                print(f"❌ Job lease renewal failed: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+
+    async def _process(self, job: dict) -> None:
+        if job["attempts"] > 1 and job["error"] is None:
+            self.recovered += 1
+        if job["attempts"] > self.max_attempts:
+            # Every earlier attempt died with its worker; stop before this song takes down another one
+            self.failed += 1
+            await self.store.update(
+                job["id"], status="failed", error=f"gave up after {self.max_attempts} attempts", finished_at=time.time(),
+            )
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            song_key, size = await self.run(job)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job straight back rather than leaving it to the lease timeout
+            await self.store.update(job["id"], status="queued", attempts=job["attempts"] - 1, lease_until=None)
+            raise
+        except Busy:
+            # Not the song's fault, so it does not count as an attempt
+            self.requeued += 1
+            await self.store.update(
+                job["id"], status="queued", attempts=job["attempts"] - 1, run_after=time.time() + self.retry_delay,
+            )
+        except Exception as e:
+            self.failed += 1
+            await self.store.update(job["id"], status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        else:
+            self.completed += 1
+            await self.store.update(job["id"], status="done", song_key=song_key, size=size, finished_at=time.time())
+        finally:
+            heartbeat.cancel()
+            # A finished job frees its caller's allowance, so requeued jobs may be runnable now
+            self._wakeup.set()
+
+    async def close(self) -> None:
+        # Jobs cut off here are requeued; after a crash they are claimed again once the lease runs out
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": len(self._running),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "requeued": self.requeued,
+            "recovered": self.recovered,
+            "errors": self.errors,
+        }
@@ -0,0 +1,20 @@
+import re
+
+VERSE_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_lyrics(text: str, max_chars: int) -> list[str]:
+    # One chunk per verse (blank-line separated), so editing a line only changes that verse's chunk;
+    # a verse longer than max_chars is cut at line breaks
+    chunks = []
+    for verse in VERSE_BREAK.split(text.strip()):
+        current = ""
+        for line in verse.strip().splitlines():
+            if current and len(current) + len(line) + 1 > max_chars:
+                chunks.append(current)
+                current = line
+            else:
+                current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+    return chunks or [text]
@@ -1,13 +1,35 @@
 import os
+import json
+import time
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastmcp import FastMCP
+from fastmcp import Client, Context, FastMCP
+from fastmcp.exceptions import ResourceError
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
+from fastmcp.tools.tool import ToolResult
+from mcp.types import AudioContent, ResourceLink, TextContent
 from dotenv import load_dotenv
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Literal
 from pydantic import BaseModel, Field
-from elevenlabs.client import ElevenLabs
-from elevenlabs import VoiceSettings
-import base64
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from cache import AudioCache, cache_key
+from singleflight import SingleFlight
+from admission import AdmissionController, Busy
+from resilience import CircuitBreaker, CircuitOpen, ResilientCaller
+from lyrics import split_lyrics
+from backends import Backend, ElevenLabsBackend, StubBackend, SynthBackend
+from audio import MEDIA_TYPES, audio_extension, join_audio, media_type
+from metrics import Registry
+from tracing import Tracer, json_log_exporter, timings
+from http_pool import ConnectionPool
+from jobs import ANONYMOUS, JobQueue, JobStore, caller_digest
+from routing import HedgingRouter
+from offload import B64_SLICE, Offloader, b64encode, b64encode_text
+from warmup import Readiness
+from quota import QuotaScheduler
 
 load_dotenv()
 
@@ -15,11 +37,171 @@ load_dotenv()
 MY_NUMBER = os.getenv("MY_NUMBER")  
 TOKEN = os.getenv("TOKEN", "devtoken") 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL")  # override to point at bench/fake_elevenlabs.py
+ELEVENLABS_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT", 60))
+TTS_BACKEND = os.getenv("TTS_BACKEND", "elevenlabs")  # elevenlabs | stub (placeholder audio, no network) | synth (offline pcm singer)
+TTS_FALLBACK_BACKEND = os.getenv("TTS_FALLBACK_BACKEND")  # takes requests that did not pick a backend while the ElevenLabs circuit is open
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 32))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 120))  # seconds an idle connection is kept open
+HTTP2 = os.getenv("HTTP2", "0") == "1"  # needs the h2 package: uv pip install "httpx[http2]"
+UPSTREAM_ATTEMPTS = int(os.getenv("UPSTREAM_ATTEMPTS", 3))
+UPSTREAM_MAX_BACKOFF = float(os.getenv("UPSTREAM_MAX_BACKOFF", 10))
+CIRCUIT_FAILURE_RATIO = float(os.getenv("CIRCUIT_FAILURE_RATIO", 0.5))
+CIRCUIT_WINDOW = float(os.getenv("CIRCUIT_WINDOW", 30))  # seconds
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", 0.05))  # extra upstream requests hedging may add, as a fraction of calls; 0 disables
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", 0.95))  # hedge once the first chunk is slower than this share of recent calls
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))  # calls observed before a backend is hedged at all
+ELEVENLABS_CHARS_PER_MINUTE = int(os.getenv("ELEVENLABS_CHARS_PER_MINUTE", 0))  # characters sent to ElevenLabs per minute; 0 = unmetered
+ELEVENLABS_CONCURRENCY = int(os.getenv("ELEVENLABS_CONCURRENCY", 0))  # ElevenLabs requests in flight; 0 = whatever the account reports
+CACHE_PATH = os.getenv("CACHE_PATH", "songs.db")
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 512))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 16 * 1024))
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", 400))  # 0 sends lyrics in one request
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", 4))
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "mp3_44100_128")  # any ElevenLabs output_format, e.g. mp3_22050_32, opus_48000_32, pcm_16000
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "data_uri")  # data_uri | data_uri_block | resource | audio
+MAX_CONCURRENT_SYNTHESES = int(os.getenv("MAX_CONCURRENT_SYNTHESES", 8))
+MAX_SYNTHESES_PER_CALLER = int(os.getenv("MAX_SYNTHESES_PER_CALLER", 4))
+MAX_QUEUED_SYNTHESES = int(os.getenv("MAX_QUEUED_SYNTHESES", 32))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 30))
+TRACE_LOG = os.getenv("TRACE_LOG")  # JSON-lines span log: a file path, or "-" for stderr
+JOBS_PATH = os.getenv("JOBS_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_LEASE = float(os.getenv("JOB_LEASE", 30))  # seconds before a job whose worker vanished is retried
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+BATCH_MAX_SONGS = int(os.getenv("BATCH_MAX_SONGS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))  # capped at MAX_SYNTHESES_PER_CALLER
+OFFLOAD_MIN_BYTES = int(os.getenv("OFFLOAD_MIN_BYTES", 256 * 1024))  # audio this big is encoded/stitched on a worker thread
+OFFLOAD_THREADS = int(os.getenv("OFFLOAD_THREADS", 2))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # server processes sharing PORT; each has its own admission limits
+WARMUP = os.getenv("WARMUP", "1") == "1"  # connect upstream and prime caches before reporting ready
+WARMUP_LYRICS = os.getenv("WARMUP_LYRICS")  # JSON list of hot songs to cache first: "lyrics" or {"lyrics", "output_format", "backend"}
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 4))  # upstream connections opened ahead of traffic
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 60))  # report ready after this long even if warm-up is unfinished
+PUBLIC_URL = os.getenv("PUBLIC_URL", "").rstrip("/")  # base for /songs/{id} links, e.g. https://songs.example.com
 
-# Initialize client
-client = None
+# Voice
+VOICE_ID = "MUMZpJj46Atf8HF4CyAx"
+MODEL_ID = "eleven_multilingual_v2"
+VOICE_SETTINGS = dict(  # elevenlabs.VoiceSettings, built when the SDK loads
+    stability=0.4,
+    similarity_boost=0.8,
+    style=0.7,
+    use_speaker_boost=True
+)
+
+# Initialize client (async, so synthesis never blocks the event loop)
+# Shared pooled transport: connections and TLS sessions are reused across calls instead of renegotiated
+http_pool = ConnectionPool(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive=HTTP_MAX_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=ELEVENLABS_TIMEOUT,
+    http2=HTTP2,
+)
+def connect_elevenlabs():
+    # Called on the first ElevenLabs song (or by the warm-up), which is when the SDK gets imported
+    from elevenlabs.client import AsyncElevenLabs
+    return AsyncElevenLabs(
+        api_key=ELEVENLABS_API_KEY,
+        base_url=ELEVENLABS_BASE_URL,
+        timeout=ELEVENLABS_TIMEOUT,
+        httpx_client=http_pool.client,
+    )
+
+backends: dict[str, Backend] = {"stub": StubBackend(STREAM_CHUNK_SIZE), "synth": SynthBackend()}
 if ELEVENLABS_API_KEY:
-    client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+    backends["elevenlabs"] = ElevenLabsBackend(connect_elevenlabs, VOICE_ID, MODEL_ID, VOICE_SETTINGS)
+
+audio_cache = AudioCache(CACHE_PATH, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+inflight = SingleFlight()
+admission = AdmissionController(
+    max_concurrency=MAX_CONCURRENT_SYNTHESES,
+    per_caller=MAX_SYNTHESES_PER_CALLER,
+    max_queue=MAX_QUEUED_SYNTHESES,
+    queue_timeout=QUEUE_TIMEOUT,
+    shared=(ANONYMOUS,),
+)
+upstream = ResilientCaller(
+    attempts=UPSTREAM_ATTEMPTS,
+    base_delay=0.5,
+    max_delay=UPSTREAM_MAX_BACKOFF,
+    breaker=CircuitBreaker(CIRCUIT_FAILURE_RATIO, CIRCUIT_WINDOW, CIRCUIT_RESET_TIMEOUT),
+)
+# Account limits are shared, so each worker process paces itself to its share of them
+quota_scheduler = QuotaScheduler(
+    chars_per_minute=ELEVENLABS_CHARS_PER_MINUTE // WEB_CONCURRENCY,
+    concurrency=ELEVENLABS_CONCURRENCY and max(ELEVENLABS_CONCURRENCY // WEB_CONCURRENCY, 1),
+    max_wait=QUEUE_TIMEOUT,
+)
+http_pool.client.event_hooks["response"].append(quota_scheduler.on_response)
+router = HedgingRouter(budget=HEDGE_BUDGET, quantile=HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES)
+verse_stats = {"synthesized": 0, "reused": 0}
+readiness = Readiness(timeout=WARMUP_TIMEOUT)
+offloader = Offloader(min_bytes=OFFLOAD_MIN_BYTES, threads=OFFLOAD_THREADS)
+
+tracer = Tracer(json_log_exporter(TRACE_LOG) if TRACE_LOG else None)
+
+# Metrics
+registry = Registry()
+tool_calls = registry.counter("mcp_tool_calls_total", "Tool calls by outcome", ("tool", "status"))
+tool_seconds = registry.histogram("mcp_tool_duration_seconds", "Tool call latency", ("tool",))
+tools_in_flight = registry.gauge("mcp_tool_calls_in_flight", "Tool calls currently running", ("tool",))
+upstream_seconds = registry.histogram("tts_upstream_duration_seconds", "TTS backend convert round trip, including draining the audio", ("backend",))
+audio_bytes_generated = registry.counter("tts_audio_bytes_generated_total", "Audio bytes produced by TTS backends", ("backend",))
+base64_seconds = registry.histogram(
+    "audio_base64_encode_seconds", "Time spent base64-encoding tool results",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+registry.callback("audio_cache_hits_total", "Audio cache hits", lambda: audio_cache.hits, kind="counter")
+registry.callback("audio_cache_misses_total", "Audio cache misses", lambda: audio_cache.misses, kind="counter")
+registry.callback(
+    "audio_cache_hit_ratio", "Audio cache hits over lookups",
+    lambda: audio_cache.hits / max(audio_cache.hits + audio_cache.misses, 1),
+)
+registry.callback("synthesis_coalesced_total", "Requests that joined an identical in-flight synthesis", lambda: inflight.coalesced, kind="counter")
+registry.callback("synthesis_active", "Syntheses holding an admission slot", lambda: admission.active)
+registry.callback("synthesis_queue_depth", "Syntheses waiting for an admission slot", lambda: admission.waiting)
+registry.callback("synthesis_rejected_total", "Syntheses turned away as busy", lambda: admission.rejected, kind="counter")
+registry.callback("upstream_retries_total", "Retried ElevenLabs calls", lambda: upstream.retries, kind="counter")
+registry.callback("upstream_http_requests_total", "HTTP requests sent to ElevenLabs", lambda: http_pool.requests, kind="counter")
+registry.callback("upstream_connections_opened_total", "New TCP connections opened to ElevenLabs", lambda: http_pool.connections_opened, kind="counter")
+registry.callback("jobs_queued", "Submitted jobs waiting for a worker", lambda: job_queue.stats()["queued"])
+registry.callback("jobs_completed_total", "Submitted jobs that produced a song", lambda: job_queue.completed, kind="counter")
+registry.callback("tts_hedged_requests_total", "Second requests sent because the first was slower than usual", lambda: router.totals()["hedged"], kind="counter")
+registry.callback("tts_hedge_wins_total", "Hedged requests that answered before the original", lambda: router.totals()["hedge_wins"], kind="counter")
+registry.callback(
+    "tts_hedge_win_ratio", "Hedge wins over hedged requests",
+    lambda: router.totals()["hedge_wins"] / max(router.totals()["hedged"], 1),
+)
+registry.callback("upstream_quota_chars_available", "Characters ElevenLabs can take right now under ELEVENLABS_CHARS_PER_MINUTE", lambda: quota_scheduler.stats()["chars_available"] or 0)
+registry.callback("upstream_quota_waiting", "ElevenLabs requests waiting for quota", lambda: quota_scheduler.stats()["queued"])
+registry.callback("upstream_throttled_total", "429 responses from ElevenLabs", lambda: quota_scheduler.throttled, kind="counter")
+registry.callback("upstream_characters_charged_total", "Characters ElevenLabs reports having billed", lambda: quota_scheduler.charged_chars, kind="counter")
+registry.callback("server_ready", "1 once startup warm-up has finished", lambda: int(readiness.ready))
+registry.callback("server_warmup_seconds", "Time spent warming up after start", readiness.warmup_seconds)
+registry.callback("upstream_circuit_open", "1 while the ElevenLabs circuit breaker is open", lambda: int(upstream.breaker.state != "closed"))
+
+class ToolMetricsMiddleware(Middleware):
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        tools_in_flight.inc(tool=tool)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with tracer.span(f"tools/call {tool}", **{"mcp.tool.name": tool}):
+                result = await call_next(context)
+            # Tools report failures as text rather than raising
+            text = result.content[0].text if result.content and result.content[0].type == "text" else ""
+            status = "busy" if text.startswith("⏳") else "error" if text.startswith("❌") else "ok"
+            return result
+        finally:
+            tools_in_flight.dec(tool=tool)
+            tool_seconds.observe(time.perf_counter() - start, tool=tool)
+            tool_calls.inc(tool=tool, status=status)
 
 class ToolDescription(BaseModel):
     description: str
@@ -27,16 +209,254 @@ class ToolDescription(BaseModel):
     side_effects: str | None = None
 
 mcp = FastMCP("song generator")
+mcp.add_middleware(ToolMetricsMiddleware())
 
 # Health check endpoint
 @mcp.tool
 async def health() -> str:
+    # Only while a warm-up runs; in-process use without the server lifecycle never starts one
+    if readiness.state == "warming":
+        return f"⏳ Warming up, not ready for traffic yet! Token: {TOKEN}"
     return f"🎵 MCP Song Generator is running! Token: {TOKEN}"
 
 @mcp.tool
 async def validate() -> str:
     return MY_NUMBER or "No phone number configured"
 
+@mcp.tool
+async def stats() -> str:
+    return json.dumps({
+        "cache": await audio_cache.stats(),
+        "coalescing": inflight.stats(),
+        "admission": admission.stats(),
+        "upstream": upstream.stats(),
+        "routing": router.stats(),
+        "quota": quota_scheduler.stats(),
+        "http": http_pool.stats(),
+        "verses": verse_stats,
+        "jobs": job_queue.stats(),
+        "offload": offloader.stats(),
+        "readiness": readiness.stats(),
+    })
+
+@mcp.tool
+async def metrics() -> str:
+    return registry.render()
+
+async def subscription() -> dict:
+    # The account's monthly character allowance, as ElevenLabs reports it
+    if "elevenlabs" not in backends:
+        return {"skipped": "no ElevenLabs client"}
+    try:
+        backend = backends["elevenlabs"]
+        await backend.load()
+        plan = await backend.client.user.subscription.get()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    resets = plan.next_character_count_reset_unix
+    return {
+        "tier": plan.tier,
+        "characters_used": plan.character_count,
+        "character_limit": plan.character_limit,
+        "characters_remaining": max(plan.character_limit - plan.character_count, 0),
+        "resets_at": datetime.fromtimestamp(resets).isoformat() if resets else None,
+    }
+
+QuotaToolDescription = ToolDescription(
+    description="Shows how much ElevenLabs quota is left: characters this minute and this month, and requests in flight.",
+    use_when="Use this before generating many or long songs, or after a Busy answer, to see how much room there is",
+)
+
+@mcp.tool(description=QuotaToolDescription.model_dump_json())
+async def quota() -> str:
+    return json.dumps({"pacing": quota_scheduler.stats(), "subscription": await subscription()})
+
+# Readiness probe: 503 until warm-up has finished, so load balancers hold traffic back until then
+@mcp.custom_route("/ready", methods=["GET"])
+async def ready_endpoint(request: Request) -> Response:
+    return JSONResponse(readiness.stats(), status_code=200 if readiness.ready else 503)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+def caller_id(headers) -> str:
+    # Callers are told apart by their bearer token; unauthenticated traffic shares the global limit only
+    token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+    return caller_digest(token) if token else ANONYMOUS
+
+def song_key(text: str, output_format: str, backend: Backend) -> str:
+    return cache_key(text, *backend.key_parts(), output_format)
+
+def upstream_down() -> bool:
+    # Open circuit, or its one probe already in flight; once the reset timeout passes the next request probes
+    breaker = upstream.breaker
+    return breaker.state == "half_open" or (breaker.state == "open" and breaker.retry_in() > 0)
+
+def select_backend(name: str | None) -> Backend | None:
+    # An explicit choice is always honoured; otherwise TTS_BACKEND, routed around ElevenLabs while it is down
+    if name is None:
+        name = TTS_BACKEND
+        if name == "elevenlabs" and TTS_FALLBACK_BACKEND and upstream_down():
+            name = TTS_FALLBACK_BACKEND
+    return backends.get(name)
+
+def backend_unavailable(name: str | None) -> str:
+    name = name or TTS_BACKEND
+    if name == "elevenlabs":
+        return "ELEVENLABS_API_KEY not configured"
+    return f"unknown TTS backend {name}"
+
+async def call_backend(backend: Backend, fn):
+    # Only remote backends sit behind retries and the circuit breaker; local ones fail fast
+    return await (upstream.call(fn) if backend.remote else fn())
+
+def prepare_lyrics(lyrics: str) -> str:
+    processed_lyrics = lyrics.strip()
+    if len(processed_lyrics.split()) < 5:
+        processed_lyrics = f"♪ {processed_lyrics} ♪\n" * 2
+    return processed_lyrics
+
+@asynccontextmanager
+async def upstream_quota(backend: Backend, chars: int):
+    # Only ElevenLabs bills by the character and caps concurrent requests; held until the audio is drained
+    if not backend.remote:
+        yield
+        return
+    with tracer.span("quota.wait", chars=chars):
+        await quota_scheduler.acquire(chars)
+    try:
+        yield
+    finally:
+        quota_scheduler.release()
+
+def hedge_quota(backend: Backend, chars: int):
+    # A hedge is one more upstream request: it goes out only with a quota slot and characters of its own
+    if not backend.remote:
+        return None
+    return lambda: quota_scheduler.release if quota_scheduler.try_acquire(chars) else None
+
+async def convert(backend: Backend, text: str, output_format: str, previous_text: str | None = None, next_text: str | None = None) -> bytes:
+    with tracer.span("tts.convert", backend=backend.name, chars=len(text), output_format=output_format) as span:
+        await backend.load()
+        async with upstream_quota(backend, len(text)):
+            start = time.perf_counter()
+            # Drain the async audio stream into one growing buffer rather than a list of chunks joined
+            # at the end, which briefly held the song twice
+            with tracer.span("tts.first_chunk"):
+                audio, first_chunk = await router.first_chunk(
+                    backend, lambda: backend.convert(text, output_format, previous_text, next_text), hedge_quota(backend, len(text)),
+                )
+                audio_bytes = bytearray(first_chunk)
+            with tracer.span("tts.drain"):
+                async for chunk in audio:
+                    audio_bytes += chunk
+            upstream_seconds.observe(time.perf_counter() - start, backend=backend.name)
+        audio_bytes_generated.inc(len(audio_bytes), backend=backend.name)
+        span.set(bytes=len(audio_bytes))
+    return audio_bytes
+
+async def synthesize(key: str, text: str, output_format: str, backend: Backend) -> bytes:
+    chunks = split_lyrics(text, CHUNK_MAX_CHARS) if CHUNK_MAX_CHARS else [text]
+    if len(chunks) == 1:
+        audio_bytes = await call_backend(backend, lambda: convert(backend, text, output_format))
+    else:
+        # Verses are synthesized in parallel and retried on their own, then stitched back in order
+        limit = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+        async def convert_chunk(i: int) -> bytes:
+            # Verses are cached on their text alone (not their neighbours), so an edited line
+            # only re-synthesizes its own verse; a repeated chorus is synthesized once
+            chunk_key = song_key(chunks[i], output_format, backend)
+            cached = await audio_cache.get(chunk_key)
+            if cached is not None:
+                verse_stats["reused"] += 1
+                return cached
+
+            previous_text = chunks[i - 1] if i > 0 else None
+            next_text = chunks[i + 1] if i + 1 < len(chunks) else None
+
+            async def fetch() -> bytes:
+                async with limit:
+                    audio_bytes = await call_backend(backend, lambda: convert(backend, chunks[i], output_format, previous_text, next_text))
+                verse_stats["synthesized"] += 1
+                await audio_cache.put(chunk_key, audio_bytes)
+                return audio_bytes
+
+            return await inflight.do(chunk_key, fetch)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(convert_chunk(i)) for i in range(len(chunks))]
+        except* Exception as e:
+            raise e.exceptions[0]
+        parts = [task.result() for task in tasks]
+        with tracer.span("audio.stitch", chunks=len(chunks)):
+            audio_bytes = await offloader.run(sum(map(len, parts)), join_audio, parts, output_format)
+
+    await audio_cache.put(key, audio_bytes)
+    return audio_bytes
+
+async def load_song(key: str, processed_lyrics: str, output_format: str, caller: str, backend: Backend) -> bytes:
+    with tracer.span("cache.lookup") as span:
+        audio_bytes = await audio_cache.get(key)
+        span.set(hit=audio_bytes is not None)
+    if audio_bytes is None:
+        with tracer.span("synthesize"):
+            # Identical requests already in flight share one upstream call, and only that call takes an
+            # admission slot: the requests riding along cost nothing upstream
+            audio_bytes = await inflight.do(key, lambda: synthesize_admitted(key, processed_lyrics, output_format, caller, backend))
+    return audio_bytes
+
+async def synthesize_admitted(key: str, processed_lyrics: str, output_format: str, caller: str, backend: Backend) -> bytes:
+    with tracer.span("admission.wait"):
+        await admission.acquire(caller)
+    try:
+        # The same song may have been made and cached while this one waited for a slot
+        audio_bytes = await audio_cache.get(key)
+        if audio_bytes is None:
+            audio_bytes = await synthesize(key, processed_lyrics, output_format, backend)
+        return audio_bytes
+    finally:
+        admission.release(caller)
+
+async def song_content(lyrics: str, key: str, audio_bytes: bytes, output: str, output_format: str) -> list:
+    mime = media_type(output_format)
+    if output == "resource":
+        song_name = f"{key}.{audio_extension(output_format)}"
+        summary = f"✅ Song generated!\n🎵 Lyrics: {lyrics[:50]}...\n📊 Size: {len(audio_bytes)} bytes\n🔗 Audio: {PUBLIC_URL}/songs/{song_name}"
+        link = ResourceLink(
+            type="resource_link",
+            uri=f"song://{song_name}",
+            name=f"song-{key[:12]}.{audio_extension(output_format)}",
+            mimeType=mime,
+            size=len(audio_bytes),
+        )
+        return [TextContent(type="text", text=summary), link]
+    if output == "audio":
+        summary = f"✅ Song generated!\n🎵 Lyrics: {lyrics[:50]}...\n📊 Size: {len(audio_bytes)} bytes"
+        with tracer.span("encode.audio_content"):
+            audio_base64 = await offloader.run(len(audio_bytes), b64encode_text, audio_bytes)
+        return [TextContent(type="text", text=summary), AudioContent(type="audio", data=audio_base64, mimeType=mime)]
+    summary = f"✅ Song generated!\n🎵 Lyrics: {lyrics[:50]}...\n📊 Size: {len(audio_bytes)} bytes\n🔗 Audio: "
+    # data_uri_block gives the data URI a block of its own: sharing a str with the emoji summary
+    # stores every base64 character in 4 bytes instead of 1
+    with tracer.span("encode.base64"):
+        start = time.perf_counter()
+        if output == "data_uri_block":
+            data_uri = await offloader.run(len(audio_bytes), b64encode_text, audio_bytes, f"data:{mime};base64,")
+            content = [TextContent(type="text", text=f"{summary}data URI below"), TextContent(type="text", text=data_uri)]
+        else:
+            # Widened once, from the finished ASCII text; the buffer behind it is already gone by then
+            text = await offloader.run(len(audio_bytes), lambda: summary + b64encode_text(audio_bytes, f"data:{mime};base64,"))
+            content = [TextContent(type="text", text=text)]
+        base64_seconds.observe(time.perf_counter() - start)
+    return content
+
+OutputMode = Literal["data_uri", "data_uri_block", "resource", "audio"]
+BackendName = Literal["elevenlabs", "stub", "synth"]
+OutputFormat = Literal["mp3_44100_128", "mp3_44100_64", "mp3_22050_32", "opus_48000_64", "opus_48000_32", "pcm_16000", "pcm_22050", "pcm_44100"]
+
 MusicToolDescription = ToolDescription(
     description="Music tool: generates music and sing for you by given lyrics.",
     use_when="Use this to generate song",
@@ -45,52 +465,458 @@ MusicToolDescription = ToolDescription(
 
 @mcp.tool(description=MusicToolDescription.model_dump_json())
 async def generate_song_base64(
-    lyrics: Annotated[str, Field(description="lyrics of the song")]
-) -> str:
+    lyrics: Annotated[str, Field(description="lyrics of the song")],
+    output: Annotated[
+        OutputMode | None,
+        Field(description="data_uri: inline base64 text, data_uri_block: the same with the data URI in a second block (smaller), resource: song:// link fetched on demand, audio: MCP audio content"),
+    ] = None,
+    output_format: Annotated[
+        OutputFormat | None,
+        Field(description="audio encoding; low-bitrate mp3 or opus keeps responses small, pcm is raw 16-bit samples for further processing"),
+    ] = None,
+    include_timings: Annotated[bool, Field(description="return per-stage timings as structured content")] = False,
+    backend: Annotated[
+        BackendName | None,
+        Field(description="elevenlabs: real singing voice, stub: placeholder audio for tests, synth: offline tone singer (pcm formats only)"),
+    ] = None,
+) -> str | ToolResult:
     try:
-        if not ELEVENLABS_API_KEY:
-            return "❌ Error: ELEVENLABS_API_KEY not configured"
-        
-        if not client:
-            return "❌ Error: ElevenLabs client not initialized"
+        tts = select_backend(backend)
+        if tts is None:
+            return f"❌ Error: {backend_unavailable(backend)}"
         
-        processed_lyrics = lyrics.strip()
-        if len(processed_lyrics.split()) < 5:
-            processed_lyrics = f"♪ {processed_lyrics} ♪\n" * 2
+        output_format = output_format or OUTPUT_FORMAT
+        with tracer.span("lyrics.prepare"):
+            processed_lyrics = prepare_lyrics(lyrics)
+            key = song_key(processed_lyrics, output_format, tts)
+        audio_bytes = await load_song(key, processed_lyrics, output_format, caller_id(get_http_headers(include_all=True)), tts)
+        content = await song_content(lyrics, key, audio_bytes, output or OUTPUT_MODE, output_format)
+
+        span = tracer.current()
+        if include_timings and span is not None:
+            return ToolResult(content=content, structured_content={"trace_id": span.trace_id, "timings": timings(span.trace)})
+        return ToolResult(content=content)
         
-        # Generate audio using ElevenLabs
-        audio = client.text_to_speech.convert(
-            voice_id="MUMZpJj46Atf8HF4CyAx",
-            model_id="eleven_multilingual_v2",  
-            text=processed_lyrics,
-            voice_settings=VoiceSettings(
-                stability=0.4,
-                similarity_boost=0.8,
-                style=0.7,  
-                use_speaker_boost=True
+    except Busy as e:
+        return f"⏳ Busy: {e}"
+    except Exception as e:
+        return f"❌ Error: {type(e).__name__}: {str(e)}"
+
+class SongRequest(BaseModel):
+    lyrics: str = Field(description="lyrics of the song")
+    output_format: OutputFormat | None = Field(default=None, description="audio encoding, as for generate_song_base64")
+    backend: BackendName | None = Field(default=None, description="TTS backend, as for generate_song_base64")
+
+BatchToolDescription = ToolDescription(
+    description="Music tool: generates many songs in one call, e.g. a playlist of lyric variants.",
+    use_when="Use this instead of repeated generate_song_base64 calls when several songs are needed at once",
+    side_effects="Returns one result per song, in request order; progress is reported as each song finishes",
+)
+
+@mcp.tool(description=BatchToolDescription.model_dump_json())
+async def generate_songs_batch(
+    songs: Annotated[list[SongRequest], Field(description="songs to generate", min_length=1, max_length=BATCH_MAX_SONGS)],
+    ctx: Context,
+    output: Annotated[
+        OutputMode,
+        Field(description="how each song is returned; resource links keep a large batch small"),
+    ] = "resource",
+) -> str | ToolResult:
+    caller = caller_id(get_http_headers(include_all=True))
+    # Duplicate songs in the batch are generated once and shared
+    jobs: dict[str, tuple[str, str, Backend]] = {}
+    keys = []
+    for song in songs:
+        tts = select_backend(song.backend)
+        if tts is None:
+            return f"❌ Error: {backend_unavailable(song.backend)}"
+        output_format = song.output_format or OUTPUT_FORMAT
+        processed_lyrics = prepare_lyrics(song.lyrics)
+        key = song_key(processed_lyrics, output_format, tts)
+        jobs.setdefault(key, (processed_lyrics, output_format, tts))
+        keys.append(key)
+
+    # Stay within the caller's admission allowance so the batch does not fill the queue with its own songs
+    limit = asyncio.Semaphore(min(BATCH_CONCURRENCY, MAX_SYNTHESES_PER_CALLER))
+
+    async def run(key: str) -> tuple[str, bytes | Exception]:
+        processed_lyrics, output_format, tts = jobs[key]
+        try:
+            async with limit:
+                with tracer.span("batch.song", key=key[:12]):
+                    return key, await load_song(key, processed_lyrics, output_format, caller, tts)
+        except Exception as e:
+            return key, e
+
+    results: dict[str, bytes | Exception] = {}
+    async with asyncio.TaskGroup() as group:
+        tasks = [group.create_task(run(key)) for key in jobs]
+        for finished in asyncio.as_completed(tasks):
+            key, result = await finished
+            results[key] = result
+            await ctx.report_progress(
+                sum(k in results for k in keys), len(keys),
+                f"{'❌' if isinstance(result, Exception) else '✅'} song {keys.index(key) + 1} of {len(keys)}",
             )
-        )
-        
-        # Convert audio generator to bytes
-        audio_bytes = b"".join(audio)
-        
-        # Encode to base64
-        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-        
-        return f"✅ Song generated!\n🎵 Lyrics: {lyrics[:50]}...\n📊 Size: {len(audio_bytes)} bytes\n🔗 Audio: data:audio/mpeg;base64,{audio_base64}"
-        
+
+    content, items = [], []
+    for index, (song, key) in enumerate(zip(songs, keys)):
+        result = results[key]
+        output_format = jobs[key][1]
+        if not isinstance(result, Exception):
+            content += await song_content(song.lyrics, key, result, output, output_format)
+            item = {"index": index, "status": "ok", "key": key, "size": len(result)}
+            if output == "resource":
+                item["uri"] = f"song://{key}.{audio_extension(output_format)}"
+        else:
+            status = "busy" if isinstance(result, Busy) else "error"
+            message = f"⏳ Busy: {result}" if status == "busy" else f"❌ Error: {type(result).__name__}: {result}"
+            content.append(TextContent(type="text", text=f"Song {index + 1}: {message}"))
+            item = {"index": index, "status": status, "key": key, "error": str(result)}
+        items.append(item)
+
+    generated = sum(item["status"] == "ok" for item in items)
+    mark = "✅" if generated == len(items) else "❌" if not generated else "⚠️"
+    summary = f"{mark} Batch: {generated}/{len(items)} songs generated ({len(jobs)} unique)"
+    return ToolResult(
+        content=[TextContent(type="text", text=summary)] + content,
+        structured_content={"generated": generated, "unique": len(jobs), "songs": items},
+    )
+
+async def run_job(job: dict) -> tuple[str, int]:
+    # Jobs without a backend follow TTS_BACKEND (and its fallback) at the time they run
+    tts = select_backend(job["backend"])
+    if tts is None:
+        raise RuntimeError(backend_unavailable(job["backend"]))
+    processed_lyrics = prepare_lyrics(job["lyrics"])
+    key = song_key(processed_lyrics, job["output_format"], tts)
+    with tracer.span("job.run", **{"job.id": job["id"]}):
+        audio_bytes = await load_song(key, processed_lyrics, job["output_format"], job["caller"], tts)
+    return key, len(audio_bytes)
+
+job_queue = JobQueue(JobStore(JOBS_PATH), run_job, workers=JOB_WORKERS, lease=JOB_LEASE, max_attempts=JOB_MAX_ATTEMPTS)
+
+SubmitToolDescription = ToolDescription(
+    description="Music tool: queues a song and returns a job id right away, for lyrics that take long to sing.",
+    use_when="Use this for long songs, then poll song_status and call fetch_song once it is done",
+    side_effects="Starts background generation",
+)
+
+@mcp.tool(description=SubmitToolDescription.model_dump_json())
+async def submit_song(
+    lyrics: Annotated[str, Field(description="lyrics of the song")],
+    output_format: Annotated[OutputFormat | None, Field(description="audio encoding, as for generate_song_base64")] = None,
+    idempotency_key: Annotated[
+        str | None,
+        Field(description="any unique string; resubmitting with the same key returns the original job instead of a new one"),
+    ] = None,
+    backend: Annotated[BackendName | None, Field(description="TTS backend, as for generate_song_base64")] = None,
+) -> str:
+    if select_backend(backend) is None:
+        return f"❌ Error: {backend_unavailable(backend)}"
+    try:
+        caller = caller_id(get_http_headers(include_all=True))
+        job, created = await job_queue.submit(caller, lyrics, output_format or OUTPUT_FORMAT, idempotency_key, backend)
     except Exception as e:
         return f"❌ Error: {type(e).__name__}: {str(e)}"
+    if not created:
+        return f"✅ Job already submitted!\n🆔 Job: {job['id']}\n📋 Status: {job['status']}"
+    return f"✅ Job submitted!\n🆔 Job: {job['id']}\n⏱️ Poll song_status, then call fetch_song when it is done"
 
-# Runner with better error handling
-async def main():
-    port = int(os.getenv("PORT", 8080))
-    
+@mcp.tool
+async def song_status(job_id: Annotated[str, Field(description="id returned by submit_song")]) -> str:
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        return f"❌ Error: unknown job {job_id}"
+    end = job["finished_at"] or time.time()
+    return json.dumps({
+        "job_id": job["id"],
+        "status": job["status"],
+        "queue_position": await job_queue.store.position(job),
+        "attempts": job["attempts"],
+        "elapsed_seconds": round(end - job["created_at"], 3),
+        "size": job["size"],
+        "error": job["error"],
+    })
+
+@mcp.tool
+async def fetch_song(
+    job_id: Annotated[str, Field(description="id returned by submit_song")],
+    output: Annotated[OutputMode | None, Field(description="how the song is returned, as for generate_song_base64")] = None,
+) -> str | ToolResult:
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        return f"❌ Error: unknown job {job_id}"
+    if job["status"] == "failed":
+        return f"❌ Error: job failed: {job['error']}"
+    if job["status"] != "done":
+        return f"⏳ Not ready: job is {job['status']}"
+    audio_bytes = await audio_cache.get(job["song_key"])
+    if audio_bytes is None:
+        return "❌ Error: song has been evicted from the cache, submit it again"
+    content = await song_content(job["lyrics"], job["song_key"], audio_bytes, output or OUTPUT_MODE, job["output_format"])
+    return ToolResult(content=content)
+
+# Runs `release` once the response is over, however it ended. A client that disconnects before the
+# body starts gets the response cancelled before the body generator ever runs, so a finally in the
+# generator would never release what the song holds
+class ReleasingStreamingResponse(StreamingResponse):
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.release()
+
+# Streaming route: forwards audio chunks as the TTS backend produces them
+@mcp.custom_route("/songs/stream", methods=["POST"])
+async def stream_song(request: Request) -> Response:
+    try:
+        body = await request.json()
+        processed_lyrics = prepare_lyrics(body["lyrics"])
+        output_format = body.get("output_format") or OUTPUT_FORMAT
+        mime = media_type(output_format)
+        backend = body.get("backend")
+        tts = select_backend(backend)
+    except Exception:
+        return JSONResponse({"error": "expected JSON body with 'lyrics' and optional 'output_format', 'backend'"}, status_code=400)
+
+    if tts is None:
+        # A backend that does not exist is the caller's mistake; ElevenLabs without an API key is ours
+        status_code = 400 if backend is not None and backend != "elevenlabs" else 503
+        return JSONResponse({"error": backend_unavailable(backend)}, status_code=status_code)
+    key = song_key(processed_lyrics, output_format, tts)
+    cached = await audio_cache.get(key)
+    if cached is not None:
+        async def cached_chunks():
+            view = memoryview(cached)
+            for start in range(0, len(view), STREAM_CHUNK_SIZE):
+                yield view[start:start + STREAM_CHUNK_SIZE]
+        return StreamingResponse(cached_chunks(), media_type=mime)
+
+    caller = caller_id(request.headers)
+    try:
+        await admission.acquire(caller)
+    except Busy as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+
+    async def open_stream():
+        await tts.load()
+        # The quota slot is held until the stream ends, so it is taken and released by hand here
+        if tts.remote:
+            await quota_scheduler.acquire(len(processed_lyrics))
+        try:
+            return await router.first_chunk(
+                tts, lambda: tts.stream(processed_lyrics, output_format, STREAM_CHUNK_SIZE), hedge_quota(tts, len(processed_lyrics)),
+            )
+        except BaseException:
+            if tts.remote:
+                quota_scheduler.release()
+            raise
+
+    # Pull the first chunk up front so upstream failures can still be retried or get a proper status code;
+    # once audio has been sent a failure can only cut the stream short
+    try:
+        audio, first_chunk = await call_backend(tts, open_stream)
+    except CircuitOpen as e:
+        admission.release(caller)
+        retry_in = str(int(upstream.breaker.retry_in()) + 1)
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": retry_in})
+    except Busy as e:
+        admission.release(caller)
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+    except Exception as e:
+        admission.release(caller)
+        return JSONResponse({"error": f"{type(e).__name__}: {e}"}, status_code=502)
+
+    async def upstream_chunks():
+        # Chunks are pulled only as fast as the client reads, so at most a few are held in memory
+        audio_bytes_generated.inc(len(first_chunk), backend=tts.name)
+        yield first_chunk
+        async for chunk in audio:
+            audio_bytes_generated.inc(len(chunk), backend=tts.name)
+            yield chunk
+
+    chunks = upstream_chunks()
+
+    async def release():
+        await chunks.aclose()
+        await audio.aclose()
+        if tts.remote:
+            quota_scheduler.release()
+        admission.release(caller)
+
+    return ReleasingStreamingResponse(chunks, release, media_type=mime)
+
+# Stored songs, addressed by cache key, for resource links returned by the tool
+async def song_resource(key: str) -> bytes:
+    audio_bytes = await audio_cache.get(key)
+    if audio_bytes is None:
+        raise ResourceError(f"Song {key} not found or evicted")
+    return audio_bytes
+
+# One template per codec, since the extension is what tells clients the MIME type
+for extension, mime in MEDIA_TYPES.items():
+    mcp.resource(f"song://{{key}}.{extension}", mime_type=mime)(song_resource)
+
+@mcp.custom_route("/songs/{name}", methods=["GET"])
+async def get_song(request: Request) -> Response:
+    key, _, extension = request.path_params["name"].partition(".")
+    size = await audio_cache.size(key)
+    if size is None or extension not in MEDIA_TYPES:
+        return JSONResponse({"error": "song not found or evicted"}, status_code=404)
+    mime = MEDIA_TYPES[extension]
+
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if request.query_params.get("encoding") == "base64":
+        # Encoded slice by slice as it is sent, so the text never exists in full on the server
+        headers["Content-Length"] = str((size + 2) // 3 * 4)
+        chunks = (b"".join(b64encode(chunk)) async for chunk in read_cached(key, size, B64_SLICE))
+        return StreamingResponse(chunks, media_type="text/plain; charset=ascii", headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(read_cached(key, size, STREAM_CHUNK_SIZE), media_type=mime, headers=headers)
+    if byte_range == ():
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range
+    data = await audio_cache.read(key, start, end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(data, status_code=206, media_type=mime, headers=headers)
+
+async def read_cached(key: str, size: int, chunk_size: int) -> AsyncIterator[bytes]:
+    # Reads the blob a slice at a time instead of loading the whole song for one response
+    for offset in range(0, size, chunk_size):
+        chunk = await audio_cache.read(key, offset, chunk_size)
+        if not chunk:
+            return  # evicted mid-response
+        yield chunk
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | tuple[()] | None:
+    # Single "bytes=" ranges only; anything else falls back to the full body
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return ()
+    return start, end
+
+async def load_sdk() -> dict:
+    # Imported on a worker thread so the event loop keeps answering while it loads; the client is then
+    # built here instead of inside the first song request
+    if "elevenlabs" not in backends:
+        return {"skipped": "no ElevenLabs client"}
+    await backends["elevenlabs"].load()
+    return {"loaded": "elevenlabs"}
+
+async def warm_connections() -> dict:
+    if "elevenlabs" not in backends:
+        return {"skipped": "no ElevenLabs client"}
+    from elevenlabs.environment import ElevenLabsEnvironment
+    url = ELEVENLABS_BASE_URL or ElevenLabsEnvironment.PRODUCTION.value
+    return {"opened": await http_pool.warm(url, min(WARMUP_CONNECTIONS, HTTP_MAX_CONNECTIONS))}
+
+async def warm_tools() -> dict:
+    # One in-process round trip through FastMCP builds the validators and serializers real calls use
+    async with Client(mcp) as local:
+        tools = await local.list_tools()
+        await local.call_tool("health")
+    return {"tools": len(tools)}
+
+async def prime_cache() -> dict:
+    with open(WARMUP_LYRICS) as f:
+        songs = [SongRequest.model_validate({"lyrics": item} if isinstance(item, str) else item) for item in json.load(f)]
+    # Through the batch tool, so the song path is warmed along with the cache
+    cached = 0
+    async with Client(mcp) as local:
+        for start in range(0, len(songs), BATCH_MAX_SONGS):
+            batch = [song.model_dump(exclude_none=True) for song in songs[start:start + BATCH_MAX_SONGS]]
+            result = await local.call_tool("generate_songs_batch", {"songs": batch, "output": "resource"})
+            if result.structured_content is None:
+                raise RuntimeError(result.content[0].text)
+            cached += result.structured_content["generated"]
+    return {"songs": len(songs), "cached": cached}
+
+async def warm_up():
+    steps = [("sdk", load_sdk), ("connections", warm_connections), ("tools", warm_tools)]
+    if WARMUP_LYRICS:
+        steps.append(("hot_songs", prime_cache))
+    await readiness.run(steps)
+
+background_tasks: set[asyncio.Task] = set()
+
+def start_background_work():
+    # Resume jobs a previous run left queued or unfinished, and warm up while the server starts listening
+    job_queue.start()
+    if not WARMUP:
+        readiness.mark_ready()
+    elif readiness.state == "starting":
+        task = asyncio.create_task(warm_up())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await job_queue.close()
+    offloader.shutdown()
+    await http_pool.aclose()
+    await audio_cache.close()
+
+def create_app():
+    # One process of a multi-worker deployment. Sessions are stateless so any process can answer any
+    # request; the audio cache and job queue are shared through their sqlite files
+    app = mcp.http_app(transport="streamable-http", stateless_http=True)
+    serve = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with serve(app):
+            start_background_work()
+            try:
+                yield
+            finally:
+                await shutdown()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+def print_banner(port: int):
     print(f"🚀 Starting MCP server on port {port}")
     print(f"🔑 API Key configured: {'Yes' if ELEVENLABS_API_KEY else 'No'}")
+    print(f"🎤 TTS backend: {TTS_BACKEND}" + (f" (falls back to {TTS_FALLBACK_BACKEND})" if TTS_FALLBACK_BACKEND else ""))
     print(f"📱 Phone number: {MY_NUMBER or 'Not set'}")
     print(f"🎫 Token: {TOKEN}")
+
+def run_workers():
+    port = int(os.getenv("PORT", 8080))
+    if ":memory:" in (CACHE_PATH, JOBS_PATH):
+        raise SystemExit("❌ WEB_CONCURRENCY > 1 needs file-backed CACHE_PATH and JOBS_PATH so workers share them")
+    print_banner(port)
+    print(f"👷 Worker processes: {WEB_CONCURRENCY}")
+    import uvicorn
+    uvicorn.run("main:create_app", factory=True, host="0.0.0.0", port=port, workers=WEB_CONCURRENCY)
+
+# Runner with better error handling
+async def main():
+    port = int(os.getenv("PORT", 8080))
+    print_banner(port)
     
+    start_background_work()
     try:
         # Start the MCP server
         await mcp.run_async("streamable-http", host="0.0.0.0", port=port)
@@ -99,6 +925,11 @@ async def main():
         # Try fallback
         print("🔄 Trying fallback configuration...")
         await mcp.run_async("http", host="0.0.0.0", port=port)
+    finally:
+        await shutdown()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WEB_CONCURRENCY > 1:
+        run_workers()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,54 @@
+import asyncio
+import binascii
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# A multiple of 3, so each slice encodes to base64 on its own without padding in the middle
+B64_SLICE = 3 * 64 * 1024
+
+
+def b64encode(data: bytes) -> Iterator[bytes]:
+    # Base64 of ~200 KB slices at a time, for writing straight into a buffer or response stream
+    view = memoryview(data)
+    for i in range(0, len(view), B64_SLICE):
+        yield binascii.b2a_base64(view[i:i + B64_SLICE], newline=False)
+
+
+def b64encode_text(data: bytes, prefix: str = "") -> str:
+    # Slices land in one buffer sized up front, so the only other copy is the final ASCII str.
+    # The GIL is handed back after each slice: off the event loop thread, the loop then waits at
+    # most one slice for it instead of a whole multi-MB encode
+    out = bytearray(len(prefix) + (len(data) + 2) // 3 * 4)
+    out[:len(prefix)] = prefix.encode("ascii")
+    position = len(prefix)
+    for encoded in b64encode(data):
+        out[position:position + len(encoded)] = encoded
+        position += len(encoded)
+        time.sleep(0)
+    return out.decode("ascii")
+
+
+# Runs CPU-heavy audio work (encoding, stitching) on worker threads once buffers are big enough for it
+# to stall the event loop; small buffers are cheaper to handle inline than to hand off
+class Offloader:
+    def __init__(self, min_bytes: int = 256 * 1024, threads: int = 2):
+        self.min_bytes = min_bytes
+        self.inline = 0
+        self.offloaded = 0
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="audio-offload")
+
+    async def run(self, size: int, fn: Callable[..., T], *args) -> T:
+        if size < self.min_bytes:
+            self.inline += 1
+            return fn(*args)
+        self.offloaded += 1
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"min_bytes": self.min_bytes, "inline": self.inline, "offloaded": self.offloaded}
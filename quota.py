@@ -0,0 +1,175 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from admission import Busy
+from resilience import retry_after
+from routing import hedge_attempt
+
+
+def _header_int(headers: httpx.Headers, name: str) -> int | None:
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+# Paces ElevenLabs requests to the account's limits instead of sending everything and retrying the 429s:
+# a token bucket of characters refilled at chars_per_minute, and at most `concurrency` requests in flight.
+# Waiting requests go shortest first, so one line of lyrics is not stuck behind a whole album; every
+# second spent waiting counts as `aging` characters less, so long songs still get their turn. A limit
+# of 0 is unbounded, unless ElevenLabs reports one in its response headers
+class QuotaScheduler:
+    def __init__(self, chars_per_minute: int = 0, concurrency: int = 0, max_wait: float = 30.0, aging: float = 100.0, pause: float = 1.0):
+        self.chars_per_minute = chars_per_minute
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.aging = aging
+        self.pause = pause  # how long a 429 without retry-after holds everything back
+        self.tokens = float(chars_per_minute)
+        self.account_concurrency = 0  # maximum-concurrent-requests, as last reported
+        self.others_in_flight = 0  # the account's requests that are not ours, e.g. other workers'
+        self.paused_until = 0.0
+        self.active = 0
+        self.granted = 0
+        self.timed_out = 0
+        self.throttled = 0
+        self.reserved_chars = 0
+        self.charged_chars = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._waiters: list[tuple[int, float, asyncio.Future]] = []
+        self._refilled_at = time.monotonic()
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    def limit(self) -> int:
+        limits = [limit for limit in (self.concurrency, self.account_concurrency) if limit]
+        if not limits:
+            return 0
+        # Stale counts from other clients of the account must never lock this one out entirely
+        return max(min(limits) - self.others_in_flight, 1)
+
+    async def acquire(self, chars: int) -> None:
+        start = time.monotonic()
+        waiter = (chars, start, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter[2], self.max_wait)
+        except BaseException as e:
+            if waiter[2].done() and not waiter[2].cancelled():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._dispatch()
+            if isinstance(e, TimeoutError):
+                self.timed_out += 1
+                raise Busy(f"waited {self.max_wait:g}s for ElevenLabs quota")
+            raise
+
+        waited = time.monotonic() - start
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def try_acquire(self, chars: int) -> bool:
+        # For hedges: a slot right now or none at all, and never ahead of requests already waiting
+        now = time.monotonic()
+        self._refill(now)
+        limit = self.limit()
+        cost = min(chars, self.chars_per_minute) if self.chars_per_minute else 0
+        if self._waiters or (limit and self.active >= limit) or now < self.paused_until or cost > self.tokens:
+            return False
+        self.tokens -= cost
+        self.active += 1
+        self.granted += 1
+        self.reserved_chars += chars
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, chars: int):
+        await self.acquire(chars)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _refill(self, now: float) -> None:
+        if self.chars_per_minute:
+            self.tokens = min(self.tokens + (now - self._refilled_at) * self.chars_per_minute / 60, self.chars_per_minute)
+        self._refilled_at = now
+
+    def _wake_in(self, delay: float) -> None:
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self) -> None:
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+        now = time.monotonic()
+        self._refill(now)
+        # Waiters whose caller gave up are removed by acquire() once it resumes
+        waiting = [waiter for waiter in self._waiters if not waiter[2].done()]
+        while waiting:
+            limit = self.limit()
+            if limit and self.active >= limit:
+                return  # the next release dispatches again
+            if now < self.paused_until:
+                self._wake_in(self.paused_until - now)
+                return
+            waiter = min(waiting, key=lambda w: w[0] - self.aging * (now - w[1]))
+            # A request bigger than the bucket goes once the bucket is full
+            cost = min(waiter[0], self.chars_per_minute) if self.chars_per_minute else 0
+            if cost > self.tokens:
+                self._wake_in((cost - self.tokens) * 60 / self.chars_per_minute)
+                return
+            waiting.remove(waiter)
+            self._waiters.remove(waiter)
+            self.tokens -= cost
+            self.active += 1
+            self.granted += 1
+            self.reserved_chars += waiter[0]
+            waiter[2].set_result(None)
+
+    async def on_response(self, response: httpx.Response) -> None:
+        # httpx response hook: ElevenLabs reports the account's concurrency on every response and what
+        # each request was billed; a 429 holds every waiting request back instead of letting them pile on
+        maximum = _header_int(response.headers, "maximum-concurrent-requests")
+        if maximum is not None:
+            self.account_concurrency = maximum
+        current = _header_int(response.headers, "current-concurrent-requests")
+        if current is not None:
+            self.others_in_flight = max(current - self.active, 0)
+        self.charged_chars += _header_int(response.headers, "character-cost") or 0
+        if response.status_code == 429:
+            self.throttled += 1
+            if hedge_attempt.get():
+                return  # the original request is still out; its answer decides whether to hold back
+            delay = retry_after(response)
+            self.paused_until = max(self.paused_until, time.monotonic() + (self.pause if delay is None else delay))
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "chars_per_minute": self.chars_per_minute or None,
+            "chars_available": int(self.tokens) if self.chars_per_minute else None,
+            "concurrency_limit": self.limit() or None,
+            "account_concurrency": self.account_concurrency or None,
+            "others_in_flight": self.others_in_flight,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "paused_seconds": round(max(self.paused_until - now, 0), 3),
+            "granted": self.granted,
+            "timed_out": self.timed_out,
+            "throttled": self.throttled,
+            "reserved_chars": self.reserved_chars,
+            "charged_chars": self.charged_chars,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.granted, 4) if self.granted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+        }
@@ -0,0 +1,167 @@
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from admission import Busy
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def api_status(exc: BaseException) -> int | None:
+    # HTTP status of an ElevenLabs API error. Looked up instead of imported, since the SDK loads on first
+    # use and nothing can have raised one before it has
+    module = sys.modules.get("elevenlabs.core.api_error")
+    if module and isinstance(exc, module.ApiError):
+        return exc.status_code
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = api_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Covers connect/read timeouts as well as dropped connections
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after(exc: BaseException) -> float | None:
+    headers = {k.lower(): v for k, v in (getattr(exc, "headers", None) or {}).items()}
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Opens once at least min_calls outcomes landed in the last window seconds and failure_ratio of them failed,
+# then lets a single probe through after reset_timeout
+class CircuitBreaker:
+    def __init__(self, failure_ratio: float, window: float, reset_timeout: float, min_calls: int = 20):
+        self.failure_ratio = failure_ratio
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.min_calls = min_calls
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == "closed":
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.short_circuited += 1
+        raise CircuitOpen(f"upstream unavailable, retry in {max(remaining, 0):.0f}s")
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            self._outcomes.clear()
+        self.state = "closed"
+        self._probing = False
+        self._record(True)
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self._record(False)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        tripped = len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio
+        if self.state == "half_open" or tripped:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def abandon(self) -> None:
+        # A cancelled probe says nothing about upstream health; let the next call probe instead
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+
+# Retries transient upstream failures with jittered exponential backoff, behind a circuit breaker
+class ResilientCaller:
+    def __init__(self, attempts: int, base_delay: float, max_delay: float, breaker: CircuitBreaker):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = await fn()
+            except (asyncio.CancelledError, Busy):
+                # Cancelled, or never sent because the account's quota had no room: neither says anything about upstream
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # Upstream answered, it just rejected this request
+                    self.breaker.record_success()
+                    raise
+                if api_status(e) == 429:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if attempt == self.attempts or delay > self.max_delay:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.state,
+            "short_circuited": self.breaker.short_circuited,
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable
+
+from backends import Backend
+
+# Set inside a hedge's task, so response hooks can tell a hedge's answer from the original's
+hedge_attempt: ContextVar[bool] = ContextVar("hedge_attempt", default=False)
+
+
+# Time to first audio chunk for one backend/model: an EWMA for the typical call and a window of recent
+# samples for the tail
+class LatencyTracker:
+    def __init__(self, alpha: float = 0.2, window: int = 256):
+        self.alpha = alpha
+        self.ewma: float | None = None
+        self.samples: deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    def observe(self, seconds: float) -> None:
+        self.ewma = seconds if self.ewma is None else self.ewma + self.alpha * (seconds - self.ewma)
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def stats(self, q: float) -> dict:
+        return {
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            f"p{round(q * 100)}_ms": round(self.quantile(q) * 1000, 1) if self.samples else None,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+        }
+
+
+# Opens audio streams and hedges the slow ones: when the first chunk takes longer than the backend's
+# usual tail, a second identical request goes out and whichever answers first is kept, the other
+# cancelled. Hedges stay on the same backend and model so both answers are the same song. A budget
+# refilled by every call caps how many extra upstream requests hedging can add, and reserve_hedge, when
+# given, must find room for each one upstream: it returns what gives that room back, or None for no hedge
+class HedgingRouter:
+    def __init__(self, budget: float = 0.05, quantile: float = 0.95, min_samples: int = 20, min_delay: float = 0.05, burst: float = 10):
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.burst = burst
+        self.trackers: dict[str, LatencyTracker] = {}
+        self._tokens = burst
+
+    def tracker(self, backend: Backend) -> LatencyTracker:
+        return self.trackers.setdefault(backend.label, LatencyTracker())
+
+    def hedge_delay(self, backend: Backend) -> float | None:
+        # Local backends have no tail worth paying a duplicate for; nor does a backend we know little about
+        tracker = self.tracker(backend)
+        if not backend.remote or self.budget <= 0 or len(tracker.samples) < self.min_samples:
+            return None
+        return max(tracker.quantile(self.quantile), self.min_delay)
+
+    async def first_chunk(
+        self,
+        backend: Backend,
+        open_stream: Callable[[], AsyncIterator[bytes]],
+        reserve_hedge: Callable[[], Callable[[], None] | None] | None = None,
+    ) -> tuple[AsyncIterator[bytes], bytes]:
+        tracker = self.tracker(backend)
+        tracker.requests += 1
+        self._tokens = min(self._tokens + self.budget, self.burst)
+
+        async def attempt(hedge: bool = False) -> tuple[AsyncIterator[bytes], bytes, float]:
+            hedge_attempt.set(hedge)
+            start = time.perf_counter()
+            stream = open_stream()
+            try:
+                chunk = await anext(stream, b"")
+            except BaseException:
+                await stream.aclose()
+                raise
+            return stream, chunk, time.perf_counter() - start
+
+        delay = self.hedge_delay(backend)
+        primary = asyncio.ensure_future(attempt())
+        tasks = [primary]
+        winner = release_hedge = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._tokens >= 1:
+                    release_hedge = reserve_hedge() if reserve_hedge is not None else (lambda: None)
+                    if release_hedge is None:
+                        tracker.hedges_skipped += 1
+                    else:
+                        self._tokens -= 1
+                        tracker.hedged += 1
+                        tasks.append(asyncio.ensure_future(attempt(hedge=True)))
+            # First success wins; a failure only counts once every attempt has failed
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in tasks if task in done and not task.exception()), None)
+                if winner is not None or not pending:
+                    break
+            if winner is None:
+                raise primary.exception() or tasks[-1].exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Both may have answered in the same instant; the loser's stream still needs closing
+            for task, result in zip(tasks, results):
+                if task is not winner and isinstance(result, tuple):
+                    await result[0].aclose()
+            # At most one stream outlives this call, and the caller's own reservation covers it
+            if release_hedge is not None:
+                release_hedge()
+
+        stream, chunk, seconds = winner.result()
+        tracker.observe(seconds)
+        if winner is not primary:
+            tracker.hedge_wins += 1
+        return stream, chunk
+
+    def totals(self) -> dict:
+        return {
+            "hedged": sum(t.hedged for t in self.trackers.values()),
+            "hedge_wins": sum(t.hedge_wins for t in self.trackers.values()),
+            "hedges_skipped": sum(t.hedges_skipped for t in self.trackers.values()),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "budget": self.budget,
+            "tokens": round(self._tokens, 2),
+            "backends": {label: tracker.stats(self.quantile) for label, tracker in self.trackers.items()},
+        }
@@ -0,0 +1,109 @@
+import json
+import secrets
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+_current: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, trace: list["Span"], trace_id: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.trace = trace
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.status = "OK"
+        trace.append(self)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    # Shaped like an OTLP/JSON span, so the log lines can be replayed into a collector later
+    def to_otel(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otel_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "ERROR" else "STATUS_CODE_OK"},
+        }
+
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    def __init__(self, exporter: Callable[[list[Span]], None] | None = None):
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current.get()
+        if parent is None:
+            span = Span(name, [], secrets.token_hex(16), None, attributes)
+        else:
+            span = Span(name, parent.trace, parent.trace_id, parent.span_id, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set(**{"exception.type": type(e).__name__})
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current.reset(token)
+            # The whole trace is exported once its root span ends
+            if parent is None and self.exporter is not None:
+                self.exporter(span.trace)
+
+    def current(self) -> Span | None:
+        return _current.get()
+
+
+def timings(trace: list[Span]) -> list[dict]:
+    root = trace[0]
+    return [
+        {
+            "name": span.name,
+            "start_ms": round((span.start_ns - root.start_ns) / 1e6, 3),
+            "duration_ms": round(span.duration_ms, 3),
+            **span.attributes,
+        }
+        for span in trace
+    ]
+
+
+def json_log_exporter(path: str) -> Callable[[list[Span]], None]:
+    # One JSON line per trace; "-" writes to stderr
+    def export(trace: list[Span]) -> None:
+        line = json.dumps({"resourceSpans": [{"scopeSpans": [{"spans": [span.to_otel() for span in trace]}]}]})
+        if path == "-":
+            print(line, file=sys.stderr, flush=True)
+        else:
+            with open(path, "a") as f:
+                f.write(line + "\n")
+
+    return export
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+# Startup warm-up, run while the server is already listening: reports "warming" until every step
+# has run, then "ready". A failed or slow step is recorded rather than keeping the server out of
+# rotation forever, since a server with a cold cache still beats no server
+class Readiness:
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self.state = "starting"
+        self.steps: dict[str, dict] = {}
+        self.started_at: float | None = None
+        self.ready_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def run(self, steps: list[tuple[str, Callable[[], Awaitable]]]) -> None:
+        self.state = "warming"
+        self.started_at = time.monotonic()
+        deadline = self.started_at + self.timeout
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                detail = await asyncio.wait_for(step(), max(deadline - time.monotonic(), 0))
+                result = {"ok": True, "detail": detail}
+            except TimeoutError:
+                result = {"ok": False, "error": f"gave up after the {self.timeout:g}s warm-up budget"}
+            except Exception as e:
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.steps[name] = {**result, "seconds": round(time.perf_counter() - start, 3)}
+        self.mark_ready()
+
+    def mark_ready(self) -> None:
+        self.state = "ready"
+        self.ready_at = time.monotonic()
+
+    def warmup_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.ready_at or time.monotonic()) - self.started_at
+
+    def stats(self) -> dict:
+        return {"state": self.state, "warmup_seconds": round(self.warmup_seconds(), 3), "steps": self.steps}